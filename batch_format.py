@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ****************************************************************************************
+# batch_format.py
+#
+# This file contains a batch formatter that runs the universal formatter's language to
+# formatter mapping over whole source trees. A manifest of every file's modification
+# time, size and content hash lets later runs skip the files that have not changed.
+#
+# It can be run without Sublime Text from the Packages directory:
+#     python3 -m sublime_geedbla.batch_format [--jobs N] [--force] folder ...
+#
+# Author   :  Gary Ash <gary.ash@icloud.com>
+# Created  :  18-Oct-2026  9:12am
+# Modified :
+#
+# Copyright © 2026 By Gary Ash All rights reserved.
+# ****************************************************************************************
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+import concurrent.futures
+
+from . import batch_runner
+from . import format_engine
+from . import package_settings
+from .formatter_registry import FormatterRegistry
+
+language_extensions = {
+    ".c": "C",
+    ".h": "C",
+    ".cc": "C++",
+    ".cpp": "C++",
+    ".cxx": "C++",
+    ".c++": "C++",
+    ".hh": "C++",
+    ".hpp": "C++",
+    ".hxx": "C++",
+    ".h++": "C++",
+    ".cs": "C#",
+    ".m": "Objective-C",
+    ".mm": "Objective-C++",
+    ".java": "Java",
+    ".go": "Go",
+    ".pl": "Perl",
+    ".pm": "Perl",
+    ".t": "Perl",
+    ".py": "Python",
+    ".pyi": "Python",
+    ".swift": "Swift",
+    ".rb": "Ruby",
+    ".rake": "Ruby",
+    ".sh": "Bash",
+    ".bash": "Bash",
+}
+
+skipped_folders = [
+    ".git",
+    ".hg",
+    ".svn",
+    "node_modules",
+    "__pycache__",
+    ".venv",
+    "venv",
+    ".tox",
+]
+
+
+def language_for(path):
+    return language_extensions.get(os.path.splitext(path)[1].lower())
+
+
+def source_files(roots):
+    for root in roots:
+        for folder, folders, names in os.walk(root):
+            folders[:] = [f for f in folders if f not in skipped_folders]
+            for name in names:
+                path = os.path.join(folder, name)
+                language = language_for(path)
+                if language is not None:
+                    yield (path, language)
+
+
+def command_key(command):
+    return hashlib.sha1("\0".join(command).encode("utf-8")).hexdigest()
+
+
+def load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as fileHandle:
+            manifest = json.load(fileHandle)
+        return manifest.get("files", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def save_manifest(path, files):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    batch_runner.write_atomically(
+        path,
+        lambda fileHandle: json.dump({"version": 1, "files": files}, fileHandle),
+        binary=False,
+    )
+
+
+def format_file(path, command, known_hash, timeout):
+    # ------------------------------------------------------------------------------------
+    # runs in a pool worker, returns (status, manifest entry, error) where status is one
+    # of "formatted", "unchanged" or "failed"
+    # ------------------------------------------------------------------------------------
+    try:
+        with open(path, "rb") as fileHandle:
+            source_code = fileHandle.read()
+        digest = hashlib.sha1(source_code).hexdigest()
+
+        if digest != known_hash:
+            (formatter_return, formatted, errors) = format_engine.run_once(
+                command, source_code, timeout
+            )
+            if formatter_return != 0:
+                message = errors.decode("utf-8", "replace").strip()
+                return (
+                    "failed",
+                    None,
+                    "exit code %d: %s" % (formatter_return, message),
+                )
+            if formatted != source_code:
+                batch_runner.write_atomically(
+                    path, lambda fileHandle: fileHandle.write(formatted), keep_mode=True
+                )
+                digest = hashlib.sha1(formatted).hexdigest()
+                info = os.stat(path)
+                entry = [info.st_mtime_ns, info.st_size, digest, command_key(command)]
+                return ("formatted", entry, None)
+
+        info = os.stat(path)
+        entry = [info.st_mtime_ns, info.st_size, digest, command_key(command)]
+        return ("unchanged", entry, None)
+    except Exception as ex:
+        return ("failed", None, str(ex))
+
+
+def run_batch(
+    roots,
+    settings,
+    manifest_path,
+    executor_class=concurrent.futures.ProcessPoolExecutor,
+    jobs=None,
+    force=False,
+    timeout=60,
+    progress=None,
+):
+    summary = batch_runner.new_summary(["formatted", "unchanged", "skipped"])
+    manifest = {} if force else load_manifest(manifest_path)
+    registry = FormatterRegistry(settings)
+
+    def tasks():
+        for path, language in source_files(roots):
+            command = registry.command(language)
+            if not command:
+                continue
+
+            path = os.path.abspath(path)
+            entry = manifest.get(path)
+            known_hash = None
+            if entry is not None and entry[3] == command_key(command):
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                if entry[0] == info.st_mtime_ns and entry[1] == info.st_size:
+                    summary["skipped"] += 1
+                    continue
+                known_hash = entry[2]
+            yield (path, format_file, (path, command, known_hash, timeout))
+
+    def on_result(path, result):
+        (status, entry, _) = result
+        if status == "failed":
+            manifest.pop(path, None)
+        else:
+            manifest[path] = entry
+
+    batch_runner.run(summary, tasks(), executor_class, jobs, progress, on_result)
+    save_manifest(manifest_path, manifest)
+    return summary
+
+
+def report(summary):
+    return batch_runner.report(
+        summary,
+        [
+            ("formatted", "formatted"),
+            ("unchanged", "unchanged"),
+            ("skipped", "skipped"),
+        ],
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="batch_format", description="Format source trees with the Gee Dbl A setup"
+    )
+    parser.add_argument("folders", nargs="+", help="folders to format")
+    parser.add_argument("--settings", default=package_settings.default_settings_path())
+    parser.add_argument(
+        "--manifest",
+        default=os.path.join(
+            package_settings.default_cache_dir(), "format_manifest.json"
+        ),
+    )
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--timeout", type=int, default=60)
+    parser.add_argument("--force", action="store_true", help="ignore the manifest")
+    args = parser.parse_args(argv)
+
+    summary = run_batch(
+        args.folders,
+        package_settings.load_settings_file(args.settings),
+        args.manifest,
+        jobs=args.jobs,
+        force=args.force,
+        timeout=args.timeout,
+    )
+    print(report(summary))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
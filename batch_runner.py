@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ****************************************************************************************
+# batch_runner.py
+#
+# This file contains the pieces the tree wide tools share: running a worker function over
+# many files on a pool with progress and a summary, the one line report of that summary,
+# and replacing a file through a temporary file so a failed write never leaves it half
+# written
+#
+# Author   :  Gary Ash <gary.ash@icloud.com>
+# Created  :  18-Oct-2026  9:12am
+# Modified :
+#
+# Copyright © 2026 By Gary Ash All rights reserved.
+# ****************************************************************************************
+
+import os
+import time
+import tempfile
+import concurrent.futures
+
+
+def write_atomically(path, write, binary=True, keep_mode=False):
+    # ------------------------------------------------------------------------------------
+    # write is called with the open temporary file, which then replaces path, with
+    # keep_mode the new file keeps the permissions of the one it replaces
+    # ------------------------------------------------------------------------------------
+    folder = os.path.dirname(os.path.abspath(path))
+    mode = os.stat(path).st_mode & 0o7777 if keep_mode else None
+    (handle, temp_path) = tempfile.mkstemp(dir=folder)
+    try:
+        if binary:
+            fileHandle = os.fdopen(handle, "wb")
+        else:
+            fileHandle = os.fdopen(handle, "w", encoding="utf-8")
+        with fileHandle:
+            write(fileHandle)
+        if mode is not None:
+            os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def new_summary(statuses):
+    summary = dict((status, 0) for status in statuses)
+    summary["failed"] = []
+    summary["started"] = time.time()
+    return summary
+
+
+def run(
+    summary,
+    tasks,
+    executor_class=concurrent.futures.ProcessPoolExecutor,
+    jobs=None,
+    progress=None,
+    on_result=None,
+):
+    # ------------------------------------------------------------------------------------
+    # tasks are (path, function, arguments), each function returns a tuple that starts
+    # with its status and ends with the error when the status is "failed", on_result sees
+    # every result for anything a tool keeps besides the counts
+    # ------------------------------------------------------------------------------------
+    with executor_class(max_workers=jobs) as executor:
+        futures = {}
+        for path, function, arguments in tasks:
+            futures[executor.submit(function, *arguments)] = path
+
+        done = 0
+        for future in concurrent.futures.as_completed(futures):
+            path = futures[future]
+            result = future.result()
+            if result[0] == "failed":
+                summary["failed"].append((path, result[-1]))
+            else:
+                summary[result[0]] += 1
+            if on_result is not None:
+                on_result(path, result)
+
+            done += 1
+            if progress is not None and done % 100 == 0:
+                progress(done, len(futures))
+
+    summary["seconds"] = time.time() - summary["started"]
+    return summary
+
+
+def report(summary, counts, rates=()):
+    # ------------------------------------------------------------------------------------
+    # counts are (label, status) in the order they are shown, rates are (format, amount)
+    # pairs shown per second after the files per second
+    # ------------------------------------------------------------------------------------
+    total = sum(summary[status] for (_, status) in counts) + len(summary["failed"])
+    seconds = max(summary["seconds"], 0.001)
+    speeds = ["%.1f files/s" % (total / seconds)]
+    speeds.extend(rate % (amount / seconds) for (rate, amount) in rates)
+    parts = ["%d %s" % (summary[status], label) for (label, status) in counts]
+    parts.append("%d failed" % len(summary["failed"]))
+    lines = [
+        "%d files in %.2fs (%s): %s"
+        % (total, seconds, ", ".join(speeds), ", ".join(parts))
+    ]
+    for path, error in summary["failed"]:
+        lines.append("%s: %s" % (path, error))
+    return "\n".join(lines)
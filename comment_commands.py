@@ -12,316 +12,411 @@
 # Copyright © 2024 By Gary Ash All rights reserved.
 # ****************************************************************************************
 
-import re
 import os
 import datetime
+import threading
+import concurrent.futures
 import sublime
 import sublime_plugin
 import sublime_geedbla.utilities
 import sublime_geedbla.preferred_setup
+from sublime_geedbla import header_parser
+from sublime_geedbla import header_template
+from sublime_geedbla import header_engine
+from sublime_geedbla.header_index import HeaderIndex, queries
 from pathlib import Path
 
-fileHeader = """top_line
-inner_line FILENAME_PLACEHOLDER
-inner_line
-inner_line
-inner_line
-inner_line Author   :  AUTHOR_PLACEHOLDER <EMAIL_PLACEHOLDER>
-inner_line Created  :  TIMESTAMP_PLACEHOLDER
-inner_line Modified :
-inner_line
-inner_line Copyright © YEAR_PLACEHOLDER By ORGANIZATION_PLACEHOLDER All rights reserved.
-last_line """
+fileHeader = header_template.default_header
+template_version = 0
 
 
 def plugin_loaded():
     loadTemplateFile()
-    sublime_geedbla.utilities.load_aettings()
+
+
+def plugin_unloaded():
+    if header_index is not None:
+        header_index.close()
 
 
 def loadTemplateFile():
-    global fileHeader
+    global template_version
 
+    # ------------------------------------------------------------------------------------
+    # the templates themselves are read (and compiled) when they are first used and again
+    # whenever they change, this just makes sure there is a user template to edit
+    # ------------------------------------------------------------------------------------
     fileHeaderTemplateFile = (
         sublime.packages_path() + "/User/sublime_geedbla_file_header.txt"
     )
     chk_file = Path(fileHeaderTemplateFile)
-    if chk_file.is_file():
-        fileHandle = open(fileHeaderTemplateFile, "r")
-        fileHeader = fileHandle.read()
-    else:
-        fileHandle = open(fileHeaderTemplateFile, "w")
-        fileHeader = fileHandle.write(fileHeader)
+    if not chk_file.is_file():
+        with open(fileHeaderTemplateFile, "w") as fileHandle:
+            fileHandle.write(fileHeader)
 
-    fileHandle.close()
+    template_version += 1
 
 
-def buildFileHeader(view, do_value_replacement=True):
-    global fileHeader
+def findTemplate(view, syntax):
+    window = view.window()
+    project_folders = window.folders() if window is not None else []
+    return header_engine.find_template(
+        sublime.packages_path() + "/User", project_folders, syntax
+    )
 
-    shebangs = {
-        "Perl": "perl",
-        "Python": "python3",
-        "Ruby": "ruby",
-        "Awk": "awk",
-        "AppleScript": "osascript",
-        "AppleScript (Binary)": "osascript",
-    }
 
-    (row, column) = sublime_geedbla.utilities.get_cursor_position(view)
-    (comment_start, comment_end) = sublime_geedbla.utilities.get_comment(view)
+# ----------------------------------------------------------------------------------------
+# the organization named in the last header that was updated, with the settings version it
+# was matched under, it stands in for the first organization until the settings change
+# ----------------------------------------------------------------------------------------
+matchedOrganization = (0, None)
 
-    single_line_comment = comment_start
-    if len(comment_end) > 0:
-        top_line = comment_start.ljust(
-            sublime_geedbla.utilities.line_length - column, "*"
-        )
-        inner_line = " *"
-        last_line = " " + comment_end.rjust(
-            sublime_geedbla.utilities.line_length - 1 - column, "*"
-        )
-    else:
-        top_line = single_line_comment.ljust(
-            sublime_geedbla.utilities.line_length - column, "*"
-        )
-        inner_line = comment_start.strip()
-        last_line = single_line_comment.ljust(
-            sublime_geedbla.utilities.line_length - column, "*"
-        )
 
-    now = datetime.datetime.now()
-    timestamp = now.strftime("%_d-%b-%Y  %_I:%M%p")
-    timestamp = timestamp.replace("AM", "am")
-    timestamp = timestamp.replace("PM", "pm")
-    year = str(now.year)
-    filename = view.file_name()
-    if filename is None:
-        filename = "<Untitled-File>"
-
-    the_shell = os.environ["SHELL"]
+def headerIdentity():
+    settings = sublime_geedbla.utilities.current_settings()
+    (version, organization) = matchedOrganization
+    if version != settings.version or organization is None:
+        organization = settings.organization
+    identity = header_engine.header_identity(settings)
+    identity["organization"] = organization
+    return identity
+
+
+def buildFileHeader(view, do_value_replacement=True):
+    (row, column) = sublime_geedbla.utilities.get_cursor_position(view)
     syn = sublime_geedbla.utilities.get_syntax(view)
-    if len(the_shell) > 0:
-        shebangs["Bash"] = os.path.basename(the_shell)
-    else:
-        shebangs["Bash"] = "bash"
-
-    if syn in shebangs:
-        landing_line = 3
-        header = "#!/usr/bin/env " + shebangs[syn] + "\n"
-        if syn == "Python" or syn == "Ruby":
-            landing_line = 4
-            header += "# -*- coding: utf-8 -*-\n"
-    else:
-        landing_line = 2
-        header = ""
-
-    header += fileHeader
-
-    comment_replacement = {
-        "top_line": top_line,
-        "inner_line": inner_line,
-        "last_line": last_line,
-    }
-
-    value_replacements = {
-        "FILENAME_PLACEHOLDER": os.path.basename(filename),
-        "YEAR_PLACEHOLDER": year,
-        "TIMESTAMP_PLACEHOLDER": timestamp,
-        "AUTHOR_PLACEHOLDER": sublime_geedbla.utilities.author,
-        "EMAIL_PLACEHOLDER": sublime_geedbla.utilities.email_address,
-        "ORGANIZATION_PLACEHOLDER": sublime_geedbla.utilities.organization,
-        "___ORGANIZATIONNAME___": sublime_geedbla.utilities.organization,
-    }
-
-    for key in comment_replacement:
-        header = header.replace(key, comment_replacement[key])
-
-    if do_value_replacement:
-        for key in value_replacements:
-            header = header.replace(key, value_replacements[key])
-
-    return (landing_line, header)
+    return header_engine.render_header(
+        syn,
+        sublime_geedbla.utilities.get_comment(view),
+        findTemplate(view, syn),
+        headerIdentity(),
+        view.file_name(),
+        datetime.datetime.now(),
+        column,
+        do_value_replacement,
+    )
 
 
 class EditFileHeaderTemplate(sublime_plugin.WindowCommand):
     def run(self):
+        # --------------------------------------------------------------------------------
+        # open the template the active view would be using, a syntax or project one if
+        # there is one
+        # --------------------------------------------------------------------------------
         fileHeaderTemplateFile = (
             sublime.packages_path() + "/User/sublime_geedbla_file_header.txt"
         )
+        view = self.window.active_view()
+        if view is not None:
+            candidates = header_template.template_candidates(
+                sublime.packages_path() + "/User",
+                self.window.folders(),
+                sublime_geedbla.utilities.get_syntax(view),
+            )
+            for path in candidates:
+                if os.path.exists(path):
+                    fileHeaderTemplateFile = path
+                    break
         if os.path.exists(fileHeaderTemplateFile):
             self.window.open_file(fileHeaderTemplateFile)
 
 
+class ProjectFileHeadersCommand(sublime_plugin.WindowCommand):
+    def run(self, insert=False, dry_run=False):
+        folders = self.window.folders()
+        if not folders:
+            sublime.status_message("There are no project folders to update.")
+            return
+
+        panel = self.window.create_output_panel("geedbla_file_headers")
+        panel.assign_syntax("Packages/Diff/Diff.sublime-syntax")
+        panel.run_command(
+            "append", {"characters": "Updating headers in %s\n" % folders}
+        )
+        self.window.run_command("show_panel", {"panel": "output.geedbla_file_headers"})
+
+        def progress(done, total):
+            sublime.status_message("Checked %d of %d file headers" % (done, total))
+
+        # --------------------------------------------------------------------------------
+        # the plugin host cannot start Python worker processes so the files are handled on
+        # a thread pool here, the command line entry point uses processes
+        # --------------------------------------------------------------------------------
+        def update_in_background():
+            summary = header_engine.run_headers(
+                folders,
+                headerIdentity(),
+                sublime.packages_path() + "/User",
+                executor_class=concurrent.futures.ThreadPoolExecutor,
+                insert=insert,
+                dry_run=dry_run,
+                progress=progress,
+            )
+            report = header_engine.report(summary)
+            text = "".join(summary["diffs"]) + report + "\n"
+            panel.run_command("append", {"characters": text})
+            sublime.status_message(report.splitlines()[0])
+
+        threading.Thread(target=update_in_background, daemon=True).start()
+
+
+# ----------------------------------------------------------------------------------------
+# the header index is opened the first time it is needed
+# ----------------------------------------------------------------------------------------
+header_index = None
+header_index_lock = threading.Lock()
+
+
+def headerIndex():
+    global header_index
+
+    with header_index_lock:
+        if header_index is None:
+            header_index = HeaderIndex(
+                sublime.packages_path()
+                + "/User/sublime_geedbla.cache/header_index.sqlite3"
+            )
+    return header_index
+
+
+class QueryFileHeadersCommand(sublime_plugin.WindowCommand):
+    def run(self, rescan=False):
+        self.rescan = rescan
+        self.folders = self.window.folders()
+        if not self.folders:
+            sublime.status_message("There are no project folders to query.")
+            return
+        self.window.show_quick_panel(
+            [caption for (caption, _) in queries], self.on_query
+        )
+
+    def on_query(self, index):
+        if index < 0:
+            return
+
+        arguments = {0: datetime.datetime.now().year}
+        arguments[2] = sublime_geedbla.utilities.current_settings().author
+
+        def query_in_background():
+            # ----------------------------------------------------------------------------
+            # the index is kept up to date by saves and project loads so it is queried as
+            # it is, the folders are only walked for a rescan or when the index has never
+            # seen them
+            # ----------------------------------------------------------------------------
+            index_db = headerIndex()
+            if self.rescan or not index_db.has_files(self.folders):
+                sublime.status_message("Updating the file header index...")
+                index_db.scan(self.folders, headerIdentity())
+            rows = index_db.query(index, self.folders, arguments.get(index))
+            sublime.set_timeout(lambda: self.show_results(queries[index][0], rows), 0)
+
+        threading.Thread(target=query_in_background, daemon=True).start()
+
+    def show_results(self, caption, rows):
+        if not rows:
+            sublime.status_message("%s: no files." % caption)
+            return
+
+        items = []
+        for path, copyrightStr, author, modified in rows:
+            relative = path
+            for folder in self.folders:
+                if path.startswith(os.path.join(folder, "")):
+                    relative = os.path.relpath(path, folder)
+                    break
+            if copyrightStr is None:
+                details = "no header"
+            else:
+                details = "%s  %s  %s" % (copyrightStr, author or "", modified or "")
+            items.append([relative, details.strip()])
+
+        def on_select(selected):
+            if selected >= 0:
+                self.window.open_file(rows[selected][0])
+
+        def on_highlight(selected):
+            self.window.open_file(rows[selected][0], sublime.TRANSIENT)
+
+        sublime.status_message("%s: %d files." % (caption, len(rows)))
+        self.window.show_quick_panel(items, on_select, 0, 0, on_highlight)
+
+
 class CommentCommandsEventListener(sublime_plugin.EventListener):
     def on_post_save(self, view):
-        fileHeaderTemplateFile = (
-            sublime.packages_path() + "/User/sublime_geedbla_file_header.txt"
-        )
+        # --------------------------------------------------------------------------------
+        # the template cache notices the new modification time by itself, the version
+        # bump tells the per view header states their rendered header is out of date
+        # --------------------------------------------------------------------------------
+        global template_version
+
+        filename = view.file_name()
+        if filename is not None and header_template.is_template_file(filename):
+            template_version += 1
+
+    def on_post_save_async(self, view):
         filename = view.file_name()
-        if filename == fileHeaderTemplateFile:
-            loadTemplateFile()
+        if filename is None:
+            return
+        extension = os.path.splitext(filename)[1].lower()
+        if extension in header_engine.header_extensions:
+            headerIndex().update_file(filename, headerIdentity())
+
+    def on_load_project_async(self, window):
+        folders = window.folders()
+        if folders:
+            headerIndex().scan(folders, headerIdentity())
+
+    def on_close(self, view):
+        header_states.pop(view.id(), None)
+
+
+# ----------------------------------------------------------------------------------------
+# what the last header update of each view found, keyed by view id, so a save that did
+# not touch the header only has to rewrite the modification time stamp
+# ----------------------------------------------------------------------------------------
+header_states = {}
+
+
+class HeaderState:
+    def __init__(self, view, head, fields, hdr, year):
+        self.end = max(end for (_, end, _) in fields.values())
+        self.head = head[: self.end]
+        self.fields = fields
+        self.hdr = hdr
+        self.file_name = view.file_name()
+        self.year = year
+        self.settings_version = sublime_geedbla.utilities.current_settings().version
+        self.template_version = template_version
+        self.change_count = view.change_count()
+
+    def hdrIsCurrent(self, view, year):
+        return (
+            self.file_name == view.file_name()
+            and self.year == year
+            and self.settings_version
+            == sublime_geedbla.utilities.current_settings().version
+            and self.template_version == template_version
+        )
+
+    def headerIsUnchanged(self, view):
+        return view.substr(sublime.Region(0, self.end)) == self.head
+
+
+class HeaderChangeListener(sublime_plugin.TextChangeListener):
+    @classmethod
+    def is_applicable(cls, buffer):
+        return True
+
+    def on_text_changed(self, changes):
+        # --------------------------------------------------------------------------------
+        # an edit that starts inside a view's header, wherever it came from, drops the
+        # cached header state, a batch that began before the state was stored (the header
+        # update itself) and edits below the header leave it alone
+        # --------------------------------------------------------------------------------
+        primary = self.buffer.primary_view()
+        if primary is None:
+            return
+        first_change = primary.change_count() - len(changes)
+
+        for view in self.buffer.views():
+            state = header_states.get(view.id())
+            if state is None or first_change < state.change_count:
+                continue
+            if any(change.a.pt <= state.end for change in changes):
+                header_states.pop(view.id(), None)
 
 
 class UpdateCommentHeaderCommand(sublime_plugin.TextCommand):
-    rCopyright = sublime.Region(-1, -1)
-    hdr = []
     now = datetime.datetime.now()
 
-    def isOneOfMyFiles(self):
+    def inComment(self, point):
+        return "comment" in self.view.scope_name(point)
+
+    def isOneOfMyFiles(self, fields):
         # --------------------------------------------------------------------------------
         # Check for a copyright notice for my or my organization to determine if i should
         # do anything at all
         # --------------------------------------------------------------------------------
-        self.rCopyright = self.view.find(
-            "\x43opyright © .* By .* All rights reserved.", 0
-        )
-        if self.rCopyright.empty() or "comment" not in self.view.scope_name(
-            self.rCopyright.a
-        ):
+        (start, _, copyrightStr) = fields["copyright"]
+        if not self.inComment(start):
             return False
 
-        copyrightStr = self.view.substr(self.rCopyright)
+        global matchedOrganization
 
-        foundOrg = False
-        if sublime_geedbla.utilities.organizations is not None:
-            for org in sublime_geedbla.utilities.organizations:
-                if org in copyrightStr:
-                    foundOrg = True
-                    sublime_geedbla.utilities.organization = org
-                    break
-
-        if foundOrg is False:
-            if "___ORGANIZATIONNAME___" not in copyrightStr:
-                return False
+        identity = headerIdentity()
+        organization = header_engine.header_organization(
+            copyrightStr, identity["organizations"], identity["organization"]
+        )
+        if organization is None:
+            return False
+        matchedOrganization = (
+            sublime_geedbla.utilities.current_settings().version,
+            organization,
+        )
         return True
 
-    def updateCopyrightNotice(self, edit):
+    def readHead(self):
+        size = min(self.view.size(), header_parser.head_size)
+        return header_parser.header_head(self.view.substr(sublime.Region(0, size)))
+
+    def run(self, edit):
         # --------------------------------------------------------------------------------
-        # update the Copyright notice
+        # a header that is exactly as the last update left it, with the same file name,
+        # year, settings and template, only needs its modification time stamp rewritten
         # --------------------------------------------------------------------------------
         self.now = datetime.datetime.now()
-        year_region = self.view.find("20[0-9]*", self.rCopyright.a)
-        last_year = self.view.substr(year_region)
-
-        if int(last_year) < self.now.year:
-            s = "Copyright © %s-%d By %s All rights reserved." % (
-                last_year,
-                datetime.datetime.now().year,
-                sublime_geedbla.utilities.organization,
+        state = header_states.get(self.view.id())
+        if (
+            state is not None
+            and state.hdrIsCurrent(self.view, self.now.year)
+            and state.headerIsUnchanged(self.view)
+        ):
+            edits = []
+            modified = header_engine.modified_edit(
+                state.fields, self.now, self.inComment
             )
+            if modified is not None:
+                edits.append(modified)
+            hdr = state.hdr
         else:
-            s = "Copyright © %s By %s All rights reserved." % (
-                last_year,
-                sublime_geedbla.utilities.organization,
-            )
-        self.view.replace(edit, self.rCopyright, s)
-
-    def updateFileName(self, edit):
-        # --------------------------------------------------------------------------------
-        # set or update the file name if there is one
-        # --------------------------------------------------------------------------------
-        nf = self.view.file_name()
-        if nf is not None:
-            new_file_name = os.path.basename(nf)
-            r = self.view.find("<Untitled-File>", 0)
-            if not r.empty() and "comment" in self.view.scope_name(r.a):
-                self.view.replace(edit, r, new_file_name)
+            # ----------------------------------------------------------------------------
+            # only the head of the file is read and parsed once, the edits are worked out
+            # against that text and applied back to front so their offsets stay good
+            # ----------------------------------------------------------------------------
+            head = self.readHead()
+            fields = header_parser.parse_header(head)
+            if fields is None or not self.isOneOfMyFiles(fields):
+                header_states.pop(self.view.id(), None)
+                return
+
+            if state is not None and state.hdrIsCurrent(self.view, self.now.year):
+                hdr = state.hdr
             else:
-                new_file_name_location = re.search(new_file_name, self.hdr)
-                if new_file_name_location is not None:
-                    file_name_search = self.hdr[0 : new_file_name_location.start() - 1]
-                    r = self.view.find(file_name_search, 0, sublime.LITERAL)
-                    if not r.empty() and "comment" in self.view.scope_name(r.a):
-                        file_name_region = self.view.line(r)
-                        r.a = r.b + 1
-                        r.b = file_name_region.b
-                        self.view.replace(edit, r, new_file_name)
-
-    def updateDateStamps(self, edit):
-        # --------------------------------------------------------------------------------
-        # update the file creation time stamp
-        # --------------------------------------------------------------------------------
-        r = self.view.find("\x43reated.*:.*$", 0)
-        if not r.empty() and "comment" in self.view.scope_name(r.a):
-            r2 = self.view.find(":.*", r.a)
-            if not r2.empty() and "comment" in self.view.scope_name(r.a):
-                r2.a = r2.a + 1
-                dateStr = self.view.substr(r2)
-                if "/" in dateStr:
-                    timestamp = created.strftime("Created  :  %_e-%b-%Y %_I:%M%p")
-                    timestamp = timestamp.replace("AM", "am")
-                    timestamp = timestamp.replace("PM", "pm")
-                    self.view.replace(edit, r, timestamp)
-        # --------------------------------------------------------------------------------
-        # update the file modification time stamp
-        # --------------------------------------------------------------------------------
-        r = self.view.find("\x4Dodified.*:.*$", 0)
-        if not r.empty() and "comment" in self.view.scope_name(r.a):
-            timestamp = self.now.strftime("Modified :  %_e-%b-%Y %_I:%M%p")
-            timestamp = timestamp.replace("AM", "am")
-            timestamp = timestamp.replace("PM", "pm")
-            self.view.replace(edit, r, timestamp)
-
-    def updateAuthorship(self, edit):
-        # --------------------------------------------------------------------------------
-        # update authorship
-        # --------------------------------------------------------------------------------
-        r = self.view.find("(.*)(Programmer|Author)(.*:)(.*)", 0)
-        if not r.empty() and "comment" in self.view.scope_name(r.a):
-            original_author_line_region = self.view.line(r)
-            (author_row, _) = self.view.rowcol(original_author_line_region.a)
-            original_author_line = self.view.substr(original_author_line_region)
-            new_author_location = re.search(
-                "(.*)(Programmer|Author)(.*:)(.*)", self.hdr
+                (_, hdr) = buildFileHeader(self.view)
+
+            identity = headerIdentity()
+            edits = header_engine.header_edits(
+                head,
+                fields,
+                hdr,
+                self.view.file_name(),
+                identity,
+                identity["organization"],
+                self.now,
+                self.inComment,
             )
-            if new_author_location is not None:
-                new_author_line = self.hdr[
-                    new_author_location.start() : new_author_location.end()
-                ]
-                matches = re.match(
-                    r"(.*(Programmer|Author)(.*:\s*))([A-z0-9]*\s*[A-z0-9]*)\s*(<[A-z0-9.]*@[A-z0-9.]*>)",
-                    original_author_line,
-                )
-                author_name = matches.group(4)
-                author_email = matches.group(5)
-                if (
-                    author_name == sublime_geedbla.utilities.author
-                    and author_email != sublime_geedbla.utilities.email_address
-                ):
-                    self.view.replace(
-                        edit, original_author_line_region, new_author_line
-                    )
-                    return
-
-                if author_name != sublime_geedbla.utilities.author:
-                    if "Author" in original_author_line:
-                        new_author_search = original_author_line.replace(
-                            "Author", "      "
-                        )
-                    if "Programmer" in original_author_line:
-                        new_author_search = original_author_line.replace(
-                            "Programmer", "          "
-                        )
-
-                    r = self.view.find(new_author_search, 0, sublime.LITERAL)
-                    if r.empty():
-                        author_comment = new_author_line + "\n" + new_author_search
-                        self.view.replace(
-                            edit, original_author_line_region, author_comment
-                        )
-            else:
-                self.view.erase(edit, original_author_line_region)
-
-    def run(self, edit):
-        if not self.isOneOfMyFiles():
-            return
 
-        self.updateCopyrightNotice(edit)
-        (_, self.hdr) = buildFileHeader(self.view)
+        for start, end, text in sorted(edits, reverse=True):
+            self.view.replace(edit, sublime.Region(start, end), text)
 
-        self.updateFileName(edit)
-        self.updateDateStamps(edit)
-        self.updateAuthorship(edit)
+        head = self.readHead()
+        fields = header_parser.parse_header(head)
+        if fields is None:
+            header_states.pop(self.view.id(), None)
+        else:
+            header_states[self.view.id()] = HeaderState(
+                self.view, head, fields, hdr, self.now.year
+            )
 
 
 class SeperatorLineCommentCommand(sublime_plugin.WindowCommand):
@@ -341,16 +436,18 @@ class SeperatorLineCommentCommand(sublime_plugin.WindowCommand):
             return
 
         decorator = decorator[0]
+        line_length = sublime_geedbla.utilities.current_settings().line_length
 
         (_, column) = sublime_geedbla.utilities.get_cursor_position(self.view)
-        (comment_start, comment_end) = sublime_geedbla.utilities.get_comment(self.view)
+        styles = sublime_geedbla.utilities.get_comment_styles(self.view)
+        (comment_start, comment_end) = styles["comment"]
         if sublime_geedbla.utilities.get_syntax(self.view) == "PHP":
             comment_end = ""
             comment_start = "#"
 
         sepLine = (
             comment_start.ljust(
-                sublime_geedbla.utilities.line_length - len(comment_end) - column,
+                line_length - len(comment_end) - column,
                 decorator,
             )
             + comment_end
@@ -376,35 +473,23 @@ class BoxCommentCommand(sublime_plugin.WindowCommand):
             return
 
         decorator = decorator[0]
+        line_length = sublime_geedbla.utilities.current_settings().line_length
         (row, column) = sublime_geedbla.utilities.get_cursor_position(self.view)
-        (comment_start, comment_end) = sublime_geedbla.utilities.get_comment(self.view)
+        styles = sublime_geedbla.utilities.get_comment_styles(self.view)
+        (comment_start, comment_end) = styles["comment"]
 
         if sublime_geedbla.utilities.get_syntax(self.view) == "PHP":
             comment_end = ""
             comment_start = "#"
 
         if len(comment_end) > 0:
-            first = (
-                comment_start.ljust(
-                    sublime_geedbla.utilities.line_length - column, decorator
-                )
-                + "\n"
-            )
+            first = comment_start.ljust(line_length - column, decorator) + "\n"
             second = " * \n"
-            third = " *" + comment_end.rjust(
-                sublime_geedbla.utilities.line_length - column - 2, decorator
-            )
+            third = " *" + comment_end.rjust(line_length - column - 2, decorator)
         else:
-            first = (
-                comment_start.ljust(
-                    sublime_geedbla.utilities.line_length - column, decorator
-                )
-                + "\n"
-            )
+            first = comment_start.ljust(line_length - column, decorator) + "\n"
             second = comment_start.strip() + " \n"
-            third = comment_start.ljust(
-                sublime_geedbla.utilities.line_length - column, decorator
-            )
+            third = comment_start.ljust(line_length - column, decorator)
 
         self.view.run_command("insert", {"characters": first})
         self.view.run_command("insert", {"characters": second})
@@ -436,4 +521,18 @@ class HeaderCommentCommand(sublime_plugin.TextCommand):
 
 class CommentEventListener(sublime_plugin.EventListener):
     def on_pre_save(self, view):
+        # --------------------------------------------------------------------------------
+        # a format worked out while the user was idle only fits the buffer as it was, so
+        # it goes in before the header is touched
+        # --------------------------------------------------------------------------------
+        view.run_command("preformat_apply")
         view.run_command("update_comment_header")
+
+
+class CommentStylesEventListener(sublime_plugin.EventListener):
+    def on_post_save(self, view):
+        filename = view.file_name()
+        if filename is not None and filename.endswith(
+            (".sublime-syntax", ".tmLanguage", ".tmPreferences")
+        ):
+            sublime_geedbla.utilities.comment_styles.clear()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ****************************************************************************************
+# config_index.py
+#
+# This file contains the index behind the configuration file launcher. The folders under
+# the configuration roots are remembered with their modification times so a refresh only
+# lists the folders that gained or lost entries, and the whole index is kept on disk so
+# the launcher has its list ready straight after a restart. The filtered file list for each
+# set of roots is kept as well so showing it never walks the folder map.
+#
+# Author   :  Gary Ash <gary.ash@icloud.com>
+# Created  :  18-Oct-2026  9:12am
+# Modified :
+#
+# Copyright © 2026 By Gary Ash All rights reserved.
+# ****************************************************************************************
+
+import os
+import re
+import json
+import fnmatch
+import threading
+
+from .batch_runner import write_atomically
+
+skipped_folders = [
+    ".git",
+    ".hg",
+    ".svn",
+    "node_modules",
+    "__pycache__",
+    ".venv",
+    "venv",
+    "Cache",
+    "cache",
+    "Caches",
+    "CachedData",
+    "Code Cache",
+    "GPUCache",
+    "logs",
+]
+
+skipped_files = [
+    ".DS_Store",
+    "*.pyc",
+    "*.log",
+    "*.lock",
+    "*.sqlite",
+    "*.sqlite3",
+    "*.db",
+    "*.db-*",
+    "*.png",
+    "*.jpg",
+    "*.gif",
+    "*.ico",
+    "*.zip",
+    "*.gz",
+]
+
+
+def skip_matcher(patterns):
+    # ------------------------------------------------------------------------------------
+    # all the globs as one compiled pattern, matched the way fnmatch.fnmatch does
+    # ------------------------------------------------------------------------------------
+    if not patterns:
+        return lambda name: None
+    pattern = "|".join(fnmatch.translate(pattern) for pattern in patterns)
+    flags = re.IGNORECASE if os.path.normcase("A") == "a" else 0
+    return re.compile(pattern, flags).match
+
+
+class ConfigIndex:
+    def __init__(self, cache_path=None, max_files=50000):
+        self.cache_path = cache_path
+        self.max_files = max_files
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self.loaded = cache_path is None
+        self.folders = {}
+        self.lists = {}
+        self.changed = False
+
+    def load(self):
+        # --------------------------------------------------------------------------------
+        # the cache file is read on first use (or from a background thread at start up),
+        # never from the constructor
+        # --------------------------------------------------------------------------------
+        with self.load_lock:
+            if self.loaded:
+                return
+            try:
+                with open(self.cache_path, "r", encoding="utf-8") as fileHandle:
+                    data = json.load(fileHandle)
+                folders = data.get("folders", {})
+                lists = data.get("lists", {})
+            except (OSError, ValueError, AttributeError):
+                (folders, lists) = ({}, {})
+            with self.lock:
+                self.folders = folders
+                self.lists = lists
+            self.loaded = True
+
+    def save(self):
+        if self.cache_path is None or not self.changed:
+            return
+        with self.lock:
+            folders = dict(self.folders)
+            lists = dict(self.lists)
+            self.changed = False
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        write_atomically(
+            self.cache_path,
+            lambda fileHandle: json.dump(
+                {"version": 2, "folders": folders, "lists": lists}, fileHandle
+            ),
+            binary=False,
+        )
+
+    def list_key(self, roots, extra_files, ignore):
+        return json.dumps([list(roots), list(extra_files), list(ignore)])
+
+    def cached_files(self, roots, extra_files=(), ignore=()):
+        # --------------------------------------------------------------------------------
+        # the list the last files() call produced for these arguments, None when there is
+        # none yet (or the cache file has not been read), this never touches the disk
+        # --------------------------------------------------------------------------------
+        if not self.loaded:
+            return None
+        return self.lists.get(self.list_key(roots, extra_files, ignore))
+
+    def list_folder(self, folder, check):
+        # --------------------------------------------------------------------------------
+        # a folder's entries are only listed again when its modification time changes,
+        # without check the remembered entries are used as they are
+        # --------------------------------------------------------------------------------
+        cached = self.folders.get(folder)
+        if not check:
+            return (cached[1], cached[2]) if cached is not None else ([], [])
+
+        try:
+            mtime = os.stat(folder).st_mtime_ns
+        except OSError:
+            with self.lock:
+                self.changed |= self.folders.pop(folder, None) is not None
+            return ([], [])
+        if cached is not None and cached[0] == mtime:
+            return (cached[1], cached[2])
+
+        names = []
+        subfolders = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subfolders.append(entry.name)
+                        elif entry.is_file():
+                            names.append(entry.name)
+                    except OSError:
+                        pass
+        except OSError:
+            return ([], [])
+
+        with self.lock:
+            self.folders[folder] = [mtime, names, subfolders]
+            self.changed = True
+        return (names, subfolders)
+
+    def files(self, roots, extra_files=(), ignore=(), check=True):
+        # --------------------------------------------------------------------------------
+        # every file under roots less the skipped folders and files and any ignore globs,
+        # followed by the extra files that exist
+        # --------------------------------------------------------------------------------
+        self.load()
+        is_file_skipped = skip_matcher(skipped_files + list(ignore))
+        is_folder_skipped = skip_matcher(skipped_folders + list(ignore))
+        found = []
+        for root in roots:
+            stack = [root]
+            while stack and len(found) < self.max_files:
+                folder = stack.pop()
+                (names, subfolders) = self.list_folder(folder, check)
+                for name in names:
+                    if not is_file_skipped(name):
+                        found.append(os.path.join(folder, name))
+                for name in subfolders:
+                    if not is_folder_skipped(name):
+                        stack.append(os.path.join(folder, name))
+
+        for path in extra_files:
+            if path not in found and os.path.isfile(path):
+                found.append(path)
+
+        key = self.list_key(roots, extra_files, ignore)
+        with self.lock:
+            if self.lists.get(key) != found:
+                self.lists[key] = found
+                self.changed = True
+        return found
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ****************************************************************************************
+# config_search.py
+#
+# This file contains a full text index of the configuration files the launcher knows
+# about. Every line is broken into tokens that are stored with their file and line number
+# in SQLite, so a search is a few index lookups rather than a grep over every file. Files
+# are only read again when their modification time or size changes.
+#
+# Author   :  Gary Ash <gary.ash@icloud.com>
+# Created  :  18-Oct-2026  9:12am
+# Modified :
+#
+# Copyright © 2026 By Gary Ash All rights reserved.
+# ****************************************************************************************
+
+import os
+import re
+import sqlite3
+import threading
+
+schema = [
+    "create table if not exists files "
+    "(id integer primary key, path text unique, mtime_ns integer, size integer)",
+    "create table if not exists lines "
+    "(file_id integer, line integer, text text, primary key (file_id, line))",
+    "create table if not exists postings (token text, file_id integer, line integer)",
+    "create index if not exists postings_token on postings (token, file_id, line)",
+    "create index if not exists postings_file on postings (file_id)",
+]
+
+schema_version = 2
+
+token_pattern = re.compile(r"[\w\-]{2,}")
+piece_pattern = re.compile(r"[^_\-]{2,}")
+
+
+def tokens(text):
+    # ------------------------------------------------------------------------------------
+    # whole keys like font_size are indexed along with their pieces, so "size" and
+    # "font siz" find them too
+    # ------------------------------------------------------------------------------------
+    found = set()
+    for token in token_pattern.findall(text):
+        token = token.lower()
+        found.add(token)
+        found.update(piece_pattern.findall(token))
+    return found
+
+
+def read_text(path, max_size):
+    # ------------------------------------------------------------------------------------
+    # None for files that are too big or look binary (a NUL in the first block)
+    # ------------------------------------------------------------------------------------
+    with open(path, "rb") as fileHandle:
+        data = fileHandle.read(max_size + 1)
+    if len(data) > max_size or b"\0" in data[:1024]:
+        return None
+    return data.decode("utf-8", "replace")
+
+
+class ConfigSearch:
+    def __init__(self, path, max_size=1024 * 1024):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            version = self.connection.execute("pragma user_version").fetchone()[0]
+            if version != schema_version:
+                for table in ("files", "lines", "postings"):
+                    self.connection.execute("drop table if exists %s" % table)
+            for statement in schema:
+                self.connection.execute(statement)
+            self.connection.execute("pragma user_version = %d" % schema_version)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def forget(self, file_id):
+        self.connection.execute("delete from postings where file_id = ?", (file_id,))
+        self.connection.execute("delete from lines where file_id = ?", (file_id,))
+        self.connection.execute("delete from files where id = ?", (file_id,))
+
+    def read_file(self, path, info=None):
+        try:
+            info = info or os.stat(path)
+            text = read_text(path, self.max_size)
+        except OSError:
+            return None
+        return (path, info, text)
+
+    def write(self, batch):
+        # --------------------------------------------------------------------------------
+        # files are read before the lock is taken, only the writes happen under it
+        # --------------------------------------------------------------------------------
+        with self.lock, self.connection:
+            for path, info, text in batch:
+                row = self.connection.execute(
+                    "select id from files where path = ?", (path,)
+                ).fetchone()
+                if row is not None:
+                    self.forget(row[0])
+                file_id = self.connection.execute(
+                    "insert into files (path, mtime_ns, size) values (?, ?, ?)",
+                    (path, info.st_mtime_ns, info.st_size),
+                ).lastrowid
+                if text is None:
+                    continue
+
+                lines = []
+                postings = []
+                for number, line in enumerate(text.splitlines(), 1):
+                    line_tokens = tokens(line)
+                    if line_tokens:
+                        lines.append((file_id, number, line))
+                        postings.extend(
+                            (token, file_id, number) for token in line_tokens
+                        )
+                self.connection.executemany("insert into lines values (?, ?, ?)", lines)
+                self.connection.executemany(
+                    "insert into postings values (?, ?, ?)", postings
+                )
+
+    def is_empty(self):
+        with self.lock:
+            return (
+                self.connection.execute("select 1 from files limit 1").fetchone()
+                is None
+            )
+
+    def update_file(self, path):
+        entry = self.read_file(path)
+        if entry is not None:
+            self.write([entry])
+
+    def update(self, paths, batch_size=200):
+        # --------------------------------------------------------------------------------
+        # brings the index in line with paths, returns the number of files read, the
+        # files are checked without holding the lock so searches are never held up
+        # --------------------------------------------------------------------------------
+        with self.lock:
+            known = dict(
+                (path, (file_id, mtime_ns, size))
+                for file_id, path, mtime_ns, size in self.connection.execute(
+                    "select id, path, mtime_ns, size from files"
+                )
+            )
+
+        read = 0
+        wanted = set()
+        batch = []
+        for path in paths:
+            wanted.add(path)
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            (_, mtime_ns, size) = known.get(path, (None, None, None))
+            if (mtime_ns, size) == (info.st_mtime_ns, info.st_size):
+                continue
+            entry = self.read_file(path, info)
+            if entry is not None:
+                batch.append(entry)
+                read += 1
+            if len(batch) >= batch_size:
+                self.write(batch)
+                batch = []
+        self.write(batch)
+
+        with self.lock, self.connection:
+            for path in set(known) - wanted:
+                self.forget(known[path][0])
+        return read
+
+    def search(self, query, limit=500):
+        # --------------------------------------------------------------------------------
+        # (path, line number, text) for lines holding every word of the query, the last
+        # word also matches as a prefix so partly typed words still find something
+        # --------------------------------------------------------------------------------
+        words = [token.lower() for token in token_pattern.findall(query)]
+        if not words:
+            return []
+
+        selects = []
+        parameters = []
+        for word in words[:-1]:
+            selects.append("select file_id, line from postings where token = ?")
+            parameters.append(word)
+        selects.append(
+            "select file_id, line from postings where token >= ? and token < ?"
+        )
+        parameters.extend([words[-1], words[-1] + "\uffff"])
+
+        with self.lock:
+            return self.connection.execute(
+                "select f.path, l.line, l.text from lines l "
+                "join files f on f.id = l.file_id "
+                "where (l.file_id, l.line) in (%s) "
+                "order by f.path, l.line limit ?" % " intersect ".join(selects),
+                parameters + [limit],
+            ).fetchall()
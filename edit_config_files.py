@@ -12,35 +12,165 @@
 # Copyright © 2024 By Gary Ash All rights reserved.
 # ****************************************************************************************
 import os
+import time
 import sublime
+import threading
 import sublime_plugin
 import sublime_geedbla.utilities
+from sublime_geedbla.config_index import ConfigIndex
+from sublime_geedbla.config_search import ConfigSearch
+
+configIndex = None
+configSearch = None
+lastSearch = ""
+refreshLock = threading.Lock()
+refresh_interval = 10 * 60
+
+
+def plugin_loaded():
+    global configIndex, configSearch
+
+    cache = sublime.packages_path() + "/User/sublime_geedbla.cache"
+    configIndex = ConfigIndex(cache + "/config_index.json")
+    threading.Thread(target=configIndex.load, daemon=True).start()
+    configSearch = ConfigSearch(cache + "/config_search.sqlite3")
+    sublime.set_timeout_async(scheduleRefresh, 5000)
+
+
+def plugin_unloaded():
+    global configSearch
+
+    # ------------------------------------------------------------------------------------
+    # a refresh that is still running closes the index itself when it finishes
+    # ------------------------------------------------------------------------------------
+    (search, configSearch) = (configSearch, None)
+    if search is not None and refreshLock.acquire(blocking=False):
+        search.close()
+        refreshLock.release()
+
+
+def refreshSearchIndex(wait=False):
+    # ------------------------------------------------------------------------------------
+    # walks the roots and brings the search index up to date, only one refresh runs at a
+    # time and searches never wait for it
+    # ------------------------------------------------------------------------------------
+    if not refreshLock.acquire(blocking=wait):
+        return
+    search = configSearch
+    try:
+        if search is None:
+            return
+        ignore = sublime_geedbla.utilities.current_settings().config_files_ignore
+        files = configIndex.files(configRoots(), shellFiles(), ignore)
+        configIndex.save()
+        search.update(files)
+    finally:
+        if search is not None and configSearch is None:
+            search.close()
+        refreshLock.release()
+
+
+def scheduleRefresh():
+    if configSearch is None:
+        return
+    threading.Thread(target=refreshSearchIndex, daemon=True).start()
+    sublime.set_timeout_async(scheduleRefresh, refresh_interval * 1000)
+
+
+def configRoots():
+    home = os.path.expanduser("~")
+    config = os.getenv("XDG_CONFIG_HOME", "") or os.path.join(home, ".config")
+    roots = [config]
+    for f in sublime_geedbla.utilities.current_settings().folders_to_open:
+        roots.append(os.path.expanduser(f))
+    roots.append(os.path.join(home, ".ssh"))
+    return [root for root in roots if os.path.isdir(root)]
+
+
+def shellFiles():
+    home = os.getenv("HOME", "")
+    zdotdir = os.getenv("ZDOTDIR", "") or home
+    return [
+        zdotdir + "/.zprofile",
+        zdotdir + "/.zshrc",
+        zdotdir + "/.zshenv",
+        home + "/.bashrc",
+        home + "/.bash_profile",
+    ]
+
+
+def addProjectFolders(window, paths):
+    # ------------------------------------------------------------------------------------
+    # folders already in the project (however they were written) are not added again
+    # ------------------------------------------------------------------------------------
+    data = window.project_data()
+    if data is None:
+        data = {}
+    folders = data.get("folders", [])
+    known = set(
+        os.path.realpath(os.path.expanduser(f.get("path", ""))) for f in folders
+    )
+    for path in paths:
+        real = os.path.realpath(os.path.expanduser(path))
+        if real not in known:
+            known.add(real)
+            folders.append({"path": path})
+    data["folders"] = folders
+    window.set_project_data(data)
 
 
 class EditConfigFiles(sublime_plugin.WindowCommand):
-    def run(self):
-        config = os.getenv("XDG_CONFIG_HOME", "")
+    def run(self, add_to_project=False):
+        if add_to_project:
+            self.addToProject()
+            return
 
-        if os.path.exists(config):
-            data = self.window.project_data()
-            if data is not None:
-                if "folders" in data:
-                    folders = data["folders"]
-                    folders.append({"path": config})
-                    data["folders"] = folders
-                else:
-                    data = {"folders": [{"path": config}]}
-            else:
-                data = {"folders": [{"path": config}]}
+        # --------------------------------------------------------------------------------
+        # the remembered list is shown straight away and brought up to date in the
+        # background, only the very first run has to wait for the scan
+        # --------------------------------------------------------------------------------
+        ignore = sublime_geedbla.utilities.current_settings().config_files_ignore
+        roots = configRoots()
+        extras = shellFiles()
+        cached = configIndex.cached_files(roots, extras, ignore)
+        if cached:
+            self.showFiles(cached)
+        else:
+            sublime.status_message("Indexing configuration files...")
+
+        def refresh():
+            files = configIndex.files(roots, extras, ignore)
+            configIndex.save()
+            if not cached:
+                sublime.set_timeout(lambda: self.showFiles(files), 0)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def showFiles(self, files):
+        if not files:
+            sublime.status_message("No configuration files found.")
+            return
+
+        home = os.path.join(os.path.expanduser("~"), "")
+        items = []
+        for path in files:
+            items.append("~/" + path[len(home) :] if path.startswith(home) else path)
 
-            folders = data["folders"]
-            for f in sublime_geedbla.utilities.folders_to_open:
-                folders.append({"path": f})
+        def on_select(index):
+            if index >= 0:
+                self.window.open_file(files[index])
 
-            folders.append({"path": "~/.ssh"})
-            data["folders"] = folders
+        self.window.show_quick_panel(items, on_select)
 
-            self.window.set_project_data(data)
+    def addToProject(self):
+        config = os.getenv("XDG_CONFIG_HOME", "")
+
+        if os.path.exists(config):
+            folders = [config]
+            for f in sublime_geedbla.utilities.current_settings().folders_to_open:
+                folders.append(f)
+            folders.append("~/.ssh")
+            addProjectFolders(self.window, folders)
         else:
             zdotdir = os.getenv("ZDOTDIR", "")
             home = os.getenv("HOME", "")
@@ -74,16 +204,65 @@ class EditConfigFiles(sublime_plugin.WindowCommand):
                 if os.path.exists(kitty):
                     self.window.open_file(kitty)
 
-    def openFolder(folder):
-        data = self.window.project_data()
-        if data is not None:
-            if "folders" in data:
-                folders = data["folders"]
-                folders.append({"path": folder})
-                data["folders"] = folders
-            else:
-                data = {"folders": [{"path": folder}]}
-        else:
-            data = {"folders": [{"path": folder}]}
+    def openFolder(self, folder):
+        addProjectFolders(self.window, [folder])
+
+
+class SearchConfigFilesCommand(sublime_plugin.WindowCommand):
+    def run(self):
+        self.window.show_input_panel(
+            "Search configuration files:", lastSearch, self.search, None, None
+        )
+
+    def search(self, query):
+        global lastSearch
+
+        lastSearch = query
+
+        # --------------------------------------------------------------------------------
+        # the query goes straight to the index, which is kept up to date on save and by
+        # a timer, only a search before the index has ever been built waits for it
+        # --------------------------------------------------------------------------------
+        def search_in_background():
+            if configSearch.is_empty():
+                refreshSearchIndex(wait=True)
+            matches = configSearch.search(query)
+            sublime.set_timeout(lambda: self.showMatches(query, matches), 0)
+
+        sublime.status_message("Searching configuration files...")
+        threading.Thread(target=search_in_background, daemon=True).start()
+
+    def showMatches(self, query, matches):
+        # --------------------------------------------------------------------------------
+        # as Default/exec.py does, the panel is created again once the result settings are
+        # in place so next_result picks them up
+        # --------------------------------------------------------------------------------
+        panel = self.window.create_output_panel("geedbla_config_search")
+        panel.settings().set("result_file_regex", r"^(.+?):([0-9]+):() (.*)$")
+        panel.settings().set("result_line_regex", "")
+        panel.settings().set("word_wrap", False)
+        panel = self.window.create_output_panel("geedbla_config_search")
+
+        lines = ['%d matches for "%s"' % (len(matches), query)]
+        for path, line, text in matches:
+            lines.append("%s:%d: %s" % (path, line, text.strip()))
+        panel.run_command(
+            "append", {"characters": "\n".join(lines) + "\n", "force": True}
+        )
+        panel.set_read_only(True)
+        self.window.run_command("show_panel", {"panel": "output.geedbla_config_search"})
+
 
-        self.window.set_project_data(data)
+class ConfigSearchEventListener(sublime_plugin.EventListener):
+    def on_post_save_async(self, view):
+        # --------------------------------------------------------------------------------
+        # a saved configuration file is indexed again on its own, new files are picked up
+        # by the next timed refresh
+        # --------------------------------------------------------------------------------
+        path = view.file_name()
+        if path is None or configSearch is None:
+            return
+        ignore = sublime_geedbla.utilities.current_settings().config_files_ignore
+        files = configIndex.cached_files(configRoots(), shellFiles(), ignore)
+        if files and path in files:
+            configSearch.update_file(path)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ****************************************************************************************
+# event_scheduler.py
+#
+# This file contains a small scheduler that collapses a burst of editor events into one
+# deferred call. Each call is filed under a key (a window or view id for example), asking
+# again before the delay is up pushes the call back and only the last request runs.
+#
+# Author   :  Gary Ash <gary.ash@icloud.com>
+# Created  :  18-Oct-2026  9:12am
+# Modified :
+#
+# Copyright © 2026 By Gary Ash All rights reserved.
+# ****************************************************************************************
+
+import sublime
+import threading
+
+
+class EventScheduler:
+    def __init__(self, delay=100):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.generations = {}
+        self.counter = 0
+
+    def schedule(self, key, callback, delay=None, on_main_thread=True):
+        # --------------------------------------------------------------------------------
+        # every request gets a new generation number, a timer that fires after a newer
+        # request was made for the same key does nothing
+        # --------------------------------------------------------------------------------
+        with self.lock:
+            self.counter += 1
+            generation = self.counter
+            self.generations[key] = generation
+
+        def fire():
+            with self.lock:
+                if self.generations.get(key) != generation:
+                    return
+                del self.generations[key]
+            callback()
+
+        if delay is None:
+            delay = self.delay
+        if on_main_thread:
+            sublime.set_timeout(fire, delay)
+        else:
+            sublime.set_timeout_async(fire, delay)
+
+    def cancel(self, key):
+        with self.lock:
+            self.generations.pop(key, None)
+
+    def is_pending(self, key):
+        return key in self.generations
@@ -14,28 +14,197 @@
 # ****************************************************************************************
 import os
 import stat
+import time
+import fnmatch
+import sublime
+import threading
+import subprocess
 import sublime_plugin
+import concurrent.futures
+from sublime_geedbla.utilities import current_settings
 
+ignoreList = [
+    ".profile",
+    ".bash_profile",
+    ".bash_logout",
+    ".bashrc",
+    ".zshrc",
+    ".zshenv",
+    ".zlogin",
+    ".zlogout",
+]
+shebangMarkers = ("#!/", "#compdef")
 
-class ExecutionBitEventListener(sublime_plugin.EventListener):
-    def on_post_save(self, view):
-        ignoreList = [
-            ".profile",
-            ".bash_profile",
-            ".bash_logout",
-            ".bashrc",
-            ".zshrc",
-            ".zshenv",
-            ".zlogin",
-            ".zlogout",
-        ]
 
+def needsExecutionBit(fileStart):
+    return fileStart.startswith(shebangMarkers)
+
+
+def executionBitMissing(mode):
+    return mode & stat.S_IRWXU != stat.S_IRWXU
+
+
+def isIgnored(filename, patterns):
+    # ------------------------------------------------------------------------------------
+    # patterns are shell style globs matched against the file name and the full path
+    # ------------------------------------------------------------------------------------
+    baseName = os.path.basename(filename)
+    for pattern in patterns:
+        if fnmatch.fnmatch(baseName, pattern) or fnmatch.fnmatch(filename, pattern):
+            return True
+    return False
+
+
+def setExecutionBit(filename):
+    perm = os.stat(filename).st_mode & 0o777
+    if executionBitMissing(perm):
+        os.chmod(filename, perm | stat.S_IRWXU)
+        return True
+    return False
+
+
+def clearExecutionBit(filename):
+    perm = os.stat(filename).st_mode & 0o777
+    os.chmod(filename, perm & ~0o111)
+
+
+def projectFiles(folder):
+    # ------------------------------------------------------------------------------------
+    # git knows which files are ignored and lists them far faster than walking the tree,
+    # anything that is not a git work tree is walked skipping version control folders
+    # ------------------------------------------------------------------------------------
+    try:
+        proc = subprocess.run(
+            ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            cwd=folder,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            timeout=60,
+        )
+        if proc.returncode == 0:
+            names = proc.stdout.decode("utf-8", "surrogateescape").split("\0")
+            return [os.path.join(folder, name) for name in names if name]
+    except (OSError, subprocess.SubprocessError):
+        pass
+
+    files = []
+    for root, folders, names in os.walk(folder):
+        folders[:] = [f for f in folders if f not in (".git", ".hg", ".svn")]
+        files.extend(os.path.join(root, name) for name in names)
+    return files
+
+
+def auditFiles(paths, patterns):
+    # ------------------------------------------------------------------------------------
+    # returns (path, problem) for scripts without the bit ("missing") and executable files
+    # that are not scripts ("not a script"), binaries (a NUL in the first bytes) and
+    # symbolic links are left alone
+    # ------------------------------------------------------------------------------------
+    problems = []
+    for path in paths:
+        if isIgnored(path, patterns):
+            continue
+        try:
+            info = os.lstat(path)
+            if not stat.S_ISREG(info.st_mode):
+                continue
+            with open(path, "rb") as fileHandle:
+                fileStart = fileHandle.read(16)
+        except OSError:
+            continue
+
+        if b"\0" in fileStart:
+            continue
+        isScript = needsExecutionBit(fileStart.decode("utf-8", "replace"))
+        if isScript and executionBitMissing(info.st_mode):
+            problems.append((path, "missing"))
+        elif not isScript and info.st_mode & 0o111:
+            problems.append((path, "not a script"))
+    return problems
+
+
+def auditFolders(folders, patterns, batch_size=512):
+    paths = []
+    for folder in folders:
+        paths.extend(projectFiles(folder))
+    batches = [paths[i : i + batch_size] for i in range(0, len(paths), batch_size)]
+
+    problems = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
+        for batch_problems in executor.map(
+            lambda batch: auditFiles(batch, patterns), batches
+        ):
+            problems.extend(batch_problems)
+    return (len(paths), sorted(problems))
+
+
+def fixProblems(problems):
+    fixed = 0
+    for path, problem in problems:
+        try:
+            if problem == "missing":
+                setExecutionBit(path)
+            else:
+                clearExecutionBit(path)
+            fixed += 1
+        except OSError:
+            pass
+    return fixed
+
+
+class AuditExecutionBitsCommand(sublime_plugin.WindowCommand):
+    def run(self):
+        folders = self.window.folders()
+        if not folders:
+            sublime.status_message("There are no project folders to audit.")
+            return
+
+        patterns = ignoreList + current_settings().executable_bit_ignore
+        panel = self.window.create_output_panel("geedbla_exec_bits")
+        sublime.status_message("Checking executable bits...")
+
+        def audit_in_background():
+            started = time.time()
+            (checked, problems) = auditFolders(folders, patterns)
+            lines = ["%-13s %s" % (problem + ":", path) for path, problem in problems]
+            lines.append(
+                "%d files checked in %.2fs, %d with the wrong executable bit"
+                % (checked, time.time() - started, len(problems))
+            )
+            panel.run_command("append", {"characters": "\n".join(lines) + "\n"})
+            self.window.run_command("show_panel", {"panel": "output.geedbla_exec_bits"})
+            if problems:
+                sublime.set_timeout(lambda: self.offer_fix(panel, problems), 0)
+
+        threading.Thread(target=audit_in_background, daemon=True).start()
+
+    def offer_fix(self, panel, problems):
+        message = (
+            "%d files have the wrong executable bit.\n\nSet it on the scripts and "
+            "clear it from the files that are not scripts?" % len(problems)
+        )
+        if sublime.ok_cancel_dialog(message, "Fix All"):
+            fixed = fixProblems(problems)
+            panel.run_command("append", {"characters": "Fixed %d files\n" % fixed})
+
+
+class ExecutionBitEventListener(sublime_plugin.EventListener):
+    def on_post_save_async(self, view):
         filename = view.file_name()
-        if filename != "":
-            baseName = os.path.basename(filename)
-            if baseName not in ignoreList:
-                r = view.find("#!/", 0)
-                c = view.find("#compdef", 0)
-                if not r.empty() or not c.empty():
-                    perm = os.stat(filename).st_mode & 0o777
-                    os.chmod(view.file_name(), perm | stat.S_IRWXU)
+        if not filename:
+            return
+
+        patterns = ignoreList + current_settings().executable_bit_ignore
+        if isIgnored(filename, patterns):
+            return
+
+        # --------------------------------------------------------------------------------
+        # a script is checked with a single stat on every save, so a bit removed by a
+        # checkout or chmod is put back, chmod only runs when the bit is missing
+        # --------------------------------------------------------------------------------
+        fileStart = view.substr(sublime.Region(0, min(view.size(), 16)))
+        if needsExecutionBit(fileStart):
+            try:
+                setExecutionBit(filename)
+            except OSError:
+                pass
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ****************************************************************************************
+# format_engine.py
+#
+# This file contains the editor independent part of running a formatter over some source
+# text. A warm worker from the formatter host is used when there is one, otherwise the
+# formatter is spawned for the one request
+#
+# Author   :  Gary Ash <gary.ash@icloud.com>
+# Created  :  18-Oct-2026  9:12am
+# Modified :
+#
+# Copyright © 2026 By Gary Ash All rights reserved.
+# ****************************************************************************************
+
+import os
+import re
+import shutil
+import tempfile
+import subprocess
+import concurrent.futures
+
+from .formatter_host import host
+from .formatter_cache import FormatterCache
+from .formatter_jobs import kill_process, process_group
+
+use_workers = True
+pool = None
+pool_size = min(8, os.cpu_count() or 1)
+cache = FormatterCache(disk_dir=None)
+
+
+def configure(
+    threads=0,
+    workers=True,
+    worker_idle_timeout=300,
+    cache_entries=256,
+    cache_dir=None,
+    cache_disk_limit=64 * 1024 * 1024,
+):
+    global use_workers
+    global pool
+    global pool_size
+
+    if threads <= 0:
+        threads = min(8, os.cpu_count() or 1)
+    if threads != pool_size:
+        if pool is not None:
+            pool.shutdown(wait=False)
+            pool = None
+        pool_size = threads
+
+    use_workers = workers
+    host.idle_timeout = worker_idle_timeout
+    if not use_workers:
+        host.shutdown()
+
+    cache.max_entries = cache_entries
+    cache.disk_dir = cache_dir
+    cache.disk_limit = cache_disk_limit
+    cache.disk_size = None
+    if cache_entries <= 0:
+        cache.clear()
+
+
+file_placeholder = re.compile(r"^\{file(\.\w+)?\}$")
+
+
+def communicate(proc, source_code=None, timeout=None, job=None):
+    # ------------------------------------------------------------------------------------
+    # the process is registered with its job so cancelling the job kills it, a formatter
+    # that runs past the timeout is killed as well
+    # ------------------------------------------------------------------------------------
+    if job is not None:
+        job.register(proc)
+    try:
+        return proc.communicate(input=source_code, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        kill_process(proc)
+        proc.communicate()
+        raise
+    finally:
+        if job is not None:
+            job.unregister(proc)
+
+
+def run_once(command, source_code, timeout=None, job=None):
+    for index, arg in enumerate(command):
+        match = file_placeholder.match(arg)
+        if match:
+            return run_in_place(
+                command, index, match.group(1) or "", source_code, timeout, job
+            )
+
+    proc = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        **process_group
+    )
+    (formatted, errors) = communicate(proc, source_code, timeout, job)
+    return (proc.returncode, formatted, errors)
+
+
+def run_in_place(command, index, extension, source_code, timeout=None, job=None):
+    # ------------------------------------------------------------------------------------
+    # formatters without a stdin mode are handed a temporary file to rewrite
+    # ------------------------------------------------------------------------------------
+    (handle, path) = tempfile.mkstemp(suffix=extension, prefix="geedbla-format-")
+    try:
+        with os.fdopen(handle, "wb") as fileHandle:
+            fileHandle.write(source_code)
+        command = command[:index] + [path] + command[index + 1 :]
+        proc = subprocess.Popen(
+            command,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            **process_group
+        )
+        (_, errors) = communicate(proc, None, timeout, job)
+        with open(path, "rb") as fileHandle:
+            formatted = fileHandle.read()
+        return (proc.returncode, formatted, errors)
+    finally:
+        os.unlink(path)
+
+
+def run_on_files(command, source_path, output_path, timeout=None, job=None):
+    # ------------------------------------------------------------------------------------
+    # the large buffer path, the formatter reads from and writes to files so the text is
+    # never held in memory here, returns (return code, path of the output, errors)
+    # ------------------------------------------------------------------------------------
+    for index, arg in enumerate(command):
+        match = file_placeholder.match(arg)
+        if match:
+            output_path += match.group(1) or ""
+            shutil.copyfile(source_path, output_path)
+            command = command[:index] + [output_path] + command[index + 1 :]
+            source_path = os.devnull
+            break
+
+    with open(source_path, "rb") as source, tempfile.TemporaryFile() as errors:
+        with open(
+            os.devnull if source_path == os.devnull else output_path, "wb"
+        ) as output:
+            proc = subprocess.Popen(
+                command, stdin=source, stdout=output, stderr=errors, **process_group
+            )
+            communicate(proc, None, timeout, job)
+        errors.seek(0)
+        return (proc.returncode, output_path, errors.read(64 * 1024))
+
+
+def format_source(command, source_code, timeout=None, job=None):
+    if job is not None:
+        job.check()
+
+    key = None
+    caching = cache.max_entries > 0 or cache.disk_dir
+    if caching:
+        key = cache.key(command, source_code)
+        formatted = cache.get(key) if key is not None else None
+        if formatted is not None:
+            return (0, formatted, b"")
+
+    result = None
+    if use_workers:
+        result = host.format(command, source_code, timeout, job)
+    if result is None:
+        result = run_once(command, source_code, timeout, job)
+    if job is not None:
+        job.check()
+
+    # ------------------------------------------------------------------------------------
+    # the output is remembered as formatting to itself as well, so running the formatter
+    # again over an already formatted buffer is a cache hit
+    # ------------------------------------------------------------------------------------
+    (formatter_return, formatted, _) = result
+    if caching and formatter_return == 0:
+        cache.put(key or cache.key(command, source_code, store=True), formatted)
+        if formatted != source_code:
+            cache.put(cache.key(command, formatted, store=True), formatted)
+    return result
+
+
+def format_many(command, sources, timeout=None, job=None):
+    # ------------------------------------------------------------------------------------
+    # formats the sources in parallel on a bounded pool, the outcome for each source is
+    # either the (return code, output, errors) tuple or the exception it raised
+    # ------------------------------------------------------------------------------------
+    global pool
+
+    if len(sources) == 1:
+        futures = [None]
+    else:
+        if pool is None:
+            pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=pool_size, thread_name_prefix="geedbla-format"
+            )
+        futures = [
+            pool.submit(format_source, command, source, timeout, job)
+            for source in sources
+        ]
+
+    outcomes = []
+    for source, future in zip(sources, futures):
+        try:
+            if future is None:
+                outcomes.append(format_source(command, source, timeout, job))
+            else:
+                outcomes.append(future.result())
+        except Exception as ex:
+            outcomes.append(ex)
+    return outcomes
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ****************************************************************************************
+# formatter_cache.py
+#
+# This file contains a content addressed cache of formatter results. A result is keyed by
+# the source text, the formatter executable (path, modification time and version) and the
+# arguments it is run with, it is kept in memory and optionally on disk
+#
+# Author   :  Gary Ash <gary.ash@icloud.com>
+# Created  :  18-Oct-2026  9:12am
+# Modified :
+#
+# Copyright © 2026 By Gary Ash All rights reserved.
+# ****************************************************************************************
+
+import os
+import shutil
+import hashlib
+import threading
+import subprocess
+import collections
+
+from .batch_runner import write_atomically
+
+
+class FormatterCache:
+    def __init__(
+        self,
+        max_entries=256,
+        max_memory=32 * 1024 * 1024,
+        disk_dir=None,
+        disk_limit=64 * 1024 * 1024,
+    ):
+        self.max_entries = max_entries
+        self.max_memory = max_memory
+        self.disk_dir = disk_dir
+        self.disk_limit = disk_limit
+        self.disk_size = None
+        self.memory_size = 0
+        self.entries = collections.OrderedDict()
+        self.versions = {}
+        self.identities = {}
+        self.lock = threading.Lock()
+
+    def key(self, command, source_code, store=False):
+        # --------------------------------------------------------------------------------
+        # None when nothing can have been stored for this formatter yet, a lookup never
+        # has to run the formatter to find out its version
+        # --------------------------------------------------------------------------------
+        identity = self.formatter_identity(command, store)
+        if identity is None:
+            return None
+        digest = hashlib.sha256()
+        digest.update(identity.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(source_code)
+        return digest.hexdigest()
+
+    def stamps(self, paths):
+        stamps = []
+        for path in paths:
+            try:
+                stamps.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                stamps.append(None)
+        return stamps
+
+    def formatter_identity(self, command, store=False):
+        # --------------------------------------------------------------------------------
+        # any argument naming a file (perltidy script, config files) adds its modification
+        # time so editing a config file or upgrading a formatter invalidates old results,
+        # the identity is remembered per command and only worked out again when one of
+        # those modification times changes
+        # --------------------------------------------------------------------------------
+        command = tuple(command)
+        with self.lock:
+            cached = self.identities.get(command)
+        if cached is not None:
+            (paths, stamps, identity) = cached
+            if self.stamps(paths) == stamps:
+                return identity
+
+        executable = os.path.realpath(shutil.which(command[0]) or command[0])
+        files = {}
+        for arg in command:
+            path = os.path.expanduser(arg.rpartition("=")[2])
+            if os.path.isfile(path):
+                files[arg] = path
+        paths = [executable] + list(files.values())
+        stamps = self.stamps(paths)
+
+        with self.lock:
+            version = self.versions.get((executable, stamps[0]))
+        if version is None:
+            if not store:
+                return None
+            version = self.version(executable, stamps[0])
+
+        identity = [executable, version]
+        for arg in command:
+            identity.append(arg)
+            if arg in files:
+                identity.append(str(stamps[paths.index(files[arg])]))
+        identity = "\0".join(identity)
+        with self.lock:
+            self.versions[(executable, stamps[0])] = version
+            self.identities[command] = (paths, stamps, identity)
+        return identity
+
+    def version(self, executable, mtime):
+        if mtime is None:
+            return ""
+        try:
+            proc = subprocess.run(
+                [executable, "--version"],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                timeout=5,
+            )
+            version = proc.stdout[:200].decode("utf-8", "replace").strip()
+        except (OSError, subprocess.SubprocessError):
+            version = ""
+        return "%d:%s" % (mtime, version)
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+
+        path = self.disk_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as fileHandle:
+                formatted = fileHandle.read()
+            os.utime(path)
+        except OSError:
+            return None
+        self.remember(key, formatted)
+        return formatted
+
+    def put(self, key, formatted):
+        self.remember(key, formatted)
+
+        path = self.disk_path(key)
+        if path is None or len(formatted) > self.disk_limit:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_atomically(path, lambda fileHandle: fileHandle.write(formatted))
+        except OSError:
+            return
+
+        with self.lock:
+            if self.disk_size is None:
+                self.disk_size = self.measure_disk()
+            else:
+                self.disk_size += len(formatted)
+            if self.disk_size > self.disk_limit:
+                self.trim_disk()
+
+    def remember(self, key, formatted):
+        if self.max_entries <= 0 or len(formatted) > self.max_memory:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self.memory_size -= len(self.entries.pop(key))
+            self.entries[key] = formatted
+            self.memory_size += len(formatted)
+            while (
+                len(self.entries) > self.max_entries
+                or self.memory_size > self.max_memory
+            ):
+                (_, evicted) = self.entries.popitem(last=False)
+                self.memory_size -= len(evicted)
+
+    def disk_path(self, key):
+        if not self.disk_dir:
+            return None
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def disk_files(self):
+        files = []
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                files.append((info.st_mtime, info.st_size, path))
+        return files
+
+    def measure_disk(self):
+        return sum(size for (_, size, _) in self.disk_files())
+
+    def trim_disk(self):
+        # --------------------------------------------------------------------------------
+        # least recently used first, down to three quarters of the limit so the trim does
+        # not run again on the very next store
+        # --------------------------------------------------------------------------------
+        files = sorted(self.disk_files())
+        self.disk_size = sum(size for (_, size, _) in files)
+        for _, size, path in files:
+            if self.disk_size <= self.disk_limit * 3 / 4:
+                break
+            try:
+                os.remove(path)
+                self.disk_size -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.memory_size = 0
@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ****************************************************************************************
+# formatter_host.py
+#
+# This file contains a host for long running formatter worker processes. Formatters that
+# are slow to start (black, perltidy) are kept warm and fed source text over a small local
+# protocol instead of spawning a new interpreter for every format request
+#
+# Author   :  Gary Ash <gary.ash@icloud.com>
+# Created  :  18-Oct-2026  9:12am
+# Modified :
+#
+# Copyright © 2026 By Gary Ash All rights reserved.
+# ****************************************************************************************
+
+import os
+import re
+import time
+import shutil
+import socket
+import threading
+import subprocess
+import http.client
+
+from .formatter_jobs import kill_process, process_group
+
+
+class WorkerError(Exception):
+    pass
+
+
+class WorkerTimeout(WorkerError):
+    pass
+
+
+class FormatterWorker:
+    # ------------------------------------------------------------------------------------
+    # a worker that can serve several requests at once is never checked out exclusively
+    # ------------------------------------------------------------------------------------
+    concurrent = False
+
+    def __init__(self, command, options):
+        self.command = command
+        self.options = options
+        self.proc = None
+        self.last_used = time.time()
+
+    def is_alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def stop(self):
+        proc = self.proc
+        self.proc = None
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            proc.terminate()
+            proc.wait(timeout=2)
+        except Exception:
+            kill_process(proc)
+
+
+# ----------------------------------------------------------------------------------------
+# black -> blackd, formatting options are sent as request headers
+# ----------------------------------------------------------------------------------------
+class BlackdWorker(FormatterWorker):
+    concurrent = True
+
+    flag_headers = {
+        "-S": ("X-Skip-String-Normalization", "1"),
+        "--skip-string-normalization": ("X-Skip-String-Normalization", "1"),
+        "-C": ("X-Skip-Magic-Trailing-Comma", "1"),
+        "--skip-magic-trailing-comma": ("X-Skip-Magic-Trailing-Comma", "1"),
+        "--preview": ("X-Preview", "1"),
+        "--fast": ("X-Fast-Or-Safe", "fast"),
+        "--pyi": ("X-Python-Variant", "pyi"),
+    }
+    ignored_flags = ["-", "-q", "--quiet", "-v", "--verbose", "--safe"]
+    config_keys = {
+        "line-length": "X-Line-Length",
+        "skip-string-normalization": "X-Skip-String-Normalization",
+        "skip-magic-trailing-comma": "X-Skip-Magic-Trailing-Comma",
+        "preview": "X-Preview",
+        "target-version": "X-Python-Variant",
+        "pyi": "X-Python-Variant",
+        "fast": "X-Fast-Or-Safe",
+    }
+    ignored_config_keys = [
+        "include",
+        "exclude",
+        "extend-exclude",
+        "force-exclude",
+        "quiet",
+        "verbose",
+        "color",
+        "required-version",
+    ]
+
+    @classmethod
+    def options_for(cls, command):
+        blackd = os.path.join(os.path.dirname(command[0]), "blackd")
+        if not os.path.isfile(blackd):
+            blackd = shutil.which("blackd")
+            if blackd is None:
+                return None
+
+        headers = {"X-Protocol-Version": "1"}
+        versions = []
+        args = command[1:]
+        index = 0
+        while index < len(args):
+            arg = args[index]
+            (name, _, value) = arg.partition("=")
+            if arg in cls.ignored_flags:
+                pass
+            elif arg in cls.flag_headers:
+                (header, header_value) = cls.flag_headers[arg]
+                headers[header] = header_value
+            elif name in ["-l", "--line-length", "-t", "--target-version", "--config"]:
+                if not value:
+                    index += 1
+                    if index >= len(args):
+                        return None
+                    value = args[index]
+                if name in ["-l", "--line-length"]:
+                    headers["X-Line-Length"] = value
+                elif name == "--config":
+                    if not cls.read_config(value, headers, versions):
+                        return None
+                else:
+                    versions.append(value)
+            else:
+                return None
+            index += 1
+
+        if versions and headers.get("X-Python-Variant") != "pyi":
+            headers["X-Python-Variant"] = ",".join(versions)
+        return {"blackd": blackd, "headers": headers}
+
+    @classmethod
+    def read_config(cls, config_file, headers, versions):
+        # --------------------------------------------------------------------------------
+        # blackd ignores config files so the handful of keys it understands are lifted
+        # out of the TOML here, anything else means the one-shot path has to be used
+        # --------------------------------------------------------------------------------
+        try:
+            with open(os.path.expanduser(config_file), "r") as fileHandle:
+                lines = fileHandle.read().splitlines()
+        except OSError:
+            return False
+
+        section = None
+        for line in lines:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith("["):
+                section = line.strip("[] ")
+                continue
+            if section not in [None, "tool.black"]:
+                continue
+
+            (key, _, value) = line.partition("=")
+            key = key.strip().strip('"').replace("_", "-")
+            value = value.strip()
+            if key in cls.ignored_config_keys:
+                continue
+            if key not in cls.config_keys:
+                return False
+
+            if key == "target-version":
+                versions.extend(re.findall(r"[\"']([^\"']+)[\"']", value))
+            elif value == "true":
+                if key == "pyi":
+                    headers["X-Python-Variant"] = "pyi"
+                elif key == "fast":
+                    headers["X-Fast-Or-Safe"] = "fast"
+                else:
+                    headers[cls.config_keys[key]] = "1"
+            elif value != "false":
+                headers[cls.config_keys[key]] = value.strip("\"'")
+        return True
+
+    def start(self):
+        probe = socket.socket()
+        probe.bind(("127.0.0.1", 0))
+        self.port = probe.getsockname()[1]
+        probe.close()
+
+        self.proc = subprocess.Popen(
+            [
+                self.options["blackd"],
+                "--bind-host",
+                "127.0.0.1",
+                "--bind-port",
+                str(self.port),
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            **process_group
+        )
+
+        deadline = time.time() + 10
+        while time.time() < deadline and self.is_alive():
+            try:
+                socket.create_connection(("127.0.0.1", self.port), 0.1).close()
+                return
+            except OSError:
+                time.sleep(0.05)
+        self.stop()
+        raise WorkerError("blackd did not start")
+
+    def format(self, data, timeout=None):
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=timeout)
+        try:
+            connection.request("POST", "/", body=data, headers=self.options["headers"])
+            response = connection.getresponse()
+            body = response.read()
+        except socket.timeout as ex:
+            raise WorkerTimeout(str(ex))
+        except (OSError, http.client.HTTPException) as ex:
+            raise WorkerError(str(ex))
+        finally:
+            connection.close()
+
+        if response.status == 200:
+            return (0, body, b"")
+        if response.status == 204:
+            return (0, data, b"")
+        return (123 if response.status == 400 else 1, b"", body)
+
+
+# ----------------------------------------------------------------------------------------
+# perl perltidy -> a resident perl loop calling Perl::Tidy, each request is a length line
+# followed by the source, each reply is "status output-length error-length" and the data
+# ----------------------------------------------------------------------------------------
+class PerltidyWorker(FormatterWorker):
+    script = r"""
+use strict;
+use warnings;
+use Perl::Tidy;
+binmode STDIN;
+binmode STDOUT;
+$| = 1;
+my $argv = shift @ARGV;
+print "ready\n";
+while (defined(my $length = <STDIN>)) {
+    chomp $length;
+    my ($source, $got) = ("", 0);
+    while ($got < $length) {
+        my $count = read(STDIN, $source, $length - $got, $got);
+        last unless $count;
+        $got += $count;
+    }
+    my ($tidied, $errors) = ("", "");
+    my $failed = Perl::Tidy::perltidy(
+        source      => \$source,
+        destination => \$tidied,
+        stderr      => \$errors,
+        errorfile   => \$errors,
+        argv        => $argv,
+    );
+    utf8::encode($tidied) if utf8::is_utf8($tidied);
+    utf8::encode($errors) if utf8::is_utf8($errors);
+    print $failed ? 1 : 0, " ", length($tidied), " ", length($errors), "\n", $tidied, $errors;
+}
+"""
+    ignored_flags = ["-st", "--standard-output", "-se", "--standard-error-output"]
+
+    @classmethod
+    def options_for(cls, command):
+        if len(command) < 2 or os.path.basename(command[1]) != "perltidy":
+            return None
+        args = [arg for arg in command[2:] if arg not in cls.ignored_flags]
+        return {"perl": command[0], "argv": " ".join(args)}
+
+    def start(self):
+        self.proc = subprocess.Popen(
+            [self.options["perl"], "-e", self.script, self.options["argv"]],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            **process_group
+        )
+        if self.proc.stdout.readline() != b"ready\n":
+            self.stop()
+            raise WorkerError("Perl::Tidy could not be loaded")
+
+    def format(self, data, timeout=None):
+        expired = []
+
+        def expire():
+            expired.append(True)
+            self.stop()
+
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, expire)
+            timer.start()
+        try:
+            proc = self.proc
+            proc.stdin.write(b"%d\n" % len(data))
+            proc.stdin.write(data)
+            proc.stdin.flush()
+
+            reply = proc.stdout.readline().split()
+            if len(reply) != 3:
+                raise WorkerError("perltidy worker exited")
+            (status, output_length, error_length) = [int(field) for field in reply]
+            tidied = proc.stdout.read(output_length)
+            errors = proc.stdout.read(error_length)
+        except (OSError, ValueError, AttributeError, WorkerError) as ex:
+            if expired:
+                raise WorkerTimeout("perltidy timed out")
+            raise WorkerError(str(ex))
+        finally:
+            if timer is not None:
+                timer.cancel()
+        return (status, tidied, errors)
+
+
+worker_classes = {
+    "black": BlackdWorker,
+    "perl": PerltidyWorker,
+}
+
+
+class FormatterHost:
+    def __init__(self, idle_timeout=300, max_workers=2, retry_delay=60):
+        self.idle_timeout = idle_timeout
+        self.max_workers = max_workers
+        self.retry_delay = retry_delay
+        self.condition = threading.Condition()
+        self.workers = {}
+        self.busy = set()
+        self.starting = {}
+        self.broken = {}
+        self.reaper = None
+
+    def format(self, command, data, timeout=None, job=None):
+        # --------------------------------------------------------------------------------
+        # returns None when there is no warm worker for this formatter so the caller can
+        # fall back to spawning the formatter directly, the worker's process is registered
+        # with the job so cancelling the job kills it (it is started again on the next
+        # request), a request that runs past the timeout kills the worker as well and
+        # raises TimeoutExpired just like a one-shot formatter
+        # --------------------------------------------------------------------------------
+        worker_class = worker_classes.get(os.path.basename(command[0]))
+        if worker_class is None or any(arg.startswith("{file") for arg in command):
+            return None
+
+        key = tuple(command)
+        if time.time() - self.broken.get(key, 0) < self.retry_delay:
+            return None
+
+        options = worker_class.options_for(command)
+        if options is None:
+            self.broken[key] = time.time()
+            return None
+
+        for _ in range(2):
+            if job is not None:
+                job.check()
+            worker = self.acquire(key, worker_class, command, options)
+            if worker is None:
+                return None
+            proc = worker.proc
+            if job is not None:
+                job.register(proc)
+            try:
+                return worker.format(data, timeout)
+            except WorkerTimeout:
+                worker.stop()
+                raise subprocess.TimeoutExpired(command, timeout)
+            except WorkerError:
+                worker.stop()
+                if job is not None:
+                    job.check()
+            finally:
+                if job is not None:
+                    job.unregister(proc)
+                self.release(key, worker)
+
+        self.broken[key] = time.time()
+        return None
+
+    def acquire(self, key, worker_class, command, options):
+        # --------------------------------------------------------------------------------
+        # a worker that is being started holds its slot in starting, so requests that
+        # arrive meanwhile wait for it rather than starting one of their own
+        # --------------------------------------------------------------------------------
+        with self.condition:
+            while True:
+                if time.time() - self.broken.get(key, 0) < self.retry_delay:
+                    return None
+                workers = [w for w in self.workers.get(key, []) if w.is_alive()]
+                self.workers[key] = workers
+                for worker in workers:
+                    if worker.concurrent or worker not in self.busy:
+                        break
+                else:
+                    worker = None
+                    limit = 1 if worker_class.concurrent else self.max_workers
+                    if len(workers) + self.starting.get(key, 0) >= limit:
+                        self.condition.wait()
+                        continue
+
+                if worker is not None:
+                    if not worker.concurrent:
+                        self.busy.add(worker)
+                    worker.last_used = time.time()
+                    return worker
+                self.starting[key] = self.starting.get(key, 0) + 1
+                break
+
+        worker = worker_class(command, options)
+        try:
+            worker.start()
+        except (OSError, WorkerError):
+            with self.condition:
+                self.broken[key] = time.time()
+                self.finish_starting(key)
+            return None
+
+        with self.condition:
+            self.finish_starting(key)
+            self.workers.setdefault(key, []).append(worker)
+            if not worker.concurrent:
+                self.busy.add(worker)
+            self.start_reaper()
+        return worker
+
+    def finish_starting(self, key):
+        self.starting[key] -= 1
+        if not self.starting[key]:
+            del self.starting[key]
+        self.condition.notify_all()
+
+    def release(self, key, worker):
+        with self.condition:
+            worker.last_used = time.time()
+            self.busy.discard(worker)
+            self.condition.notify_all()
+
+    def start_reaper(self):
+        if self.reaper is None or not self.reaper.is_alive():
+            self.reaper = threading.Thread(target=self.reap_idle_workers, daemon=True)
+            self.reaper.start()
+
+    def reap_idle_workers(self):
+        while True:
+            time.sleep(min(30, max(1, self.idle_timeout / 2)))
+            with self.condition:
+                now = time.time()
+                for key in list(self.workers):
+                    keep = []
+                    for worker in self.workers[key]:
+                        idle = now - worker.last_used > self.idle_timeout
+                        if worker.is_alive() and (worker in self.busy or not idle):
+                            keep.append(worker)
+                        else:
+                            worker.stop()
+                    if keep:
+                        self.workers[key] = keep
+                    else:
+                        del self.workers[key]
+                if not self.workers:
+                    self.reaper = None
+                    return
+
+    def shutdown(self):
+        with self.condition:
+            for workers in self.workers.values():
+                for worker in workers:
+                    worker.stop()
+            self.workers = {}
+            self.busy = set()
+            self.starting = {}
+            self.broken = {}
+
+
+host = FormatterHost()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ****************************************************************************************
+# formatter_jobs.py
+#
+# This file contains the package wide queue that formatter runs go through. Only the
+# newest job for a view is kept, a new job or an edit cancels the one in flight (killing
+# its formatter processes) and each formatter has a cap on how many jobs run at once
+#
+# Author   :  Gary Ash <gary.ash@icloud.com>
+# Created  :  18-Oct-2026  9:12am
+# Modified :
+#
+# Copyright © 2026 By Gary Ash All rights reserved.
+# ****************************************************************************************
+
+import os
+import signal
+import threading
+import collections
+
+# ----------------------------------------------------------------------------------------
+# formatters are started in their own process group so killing one also takes down any
+# children it started (wrapper scripts, interpreters) which would otherwise keep the pipes
+# open
+# ----------------------------------------------------------------------------------------
+process_group = {"start_new_session": True} if os.name == "posix" else {}
+
+
+def kill_process(proc):
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except OSError:
+        pass
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class FormatJob:
+    def __init__(self, key, formatter, work, on_done):
+        self.key = key
+        self.formatter = formatter
+        self.work = work
+        self.on_done = on_done
+        self.cancelled = False
+        self.processes = set()
+        self.lock = threading.Lock()
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            processes = list(self.processes)
+        for proc in processes:
+            kill_process(proc)
+
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def register(self, proc):
+        with self.lock:
+            self.processes.add(proc)
+            cancelled = self.cancelled
+        if cancelled:
+            kill_process(proc)
+
+    def unregister(self, proc):
+        with self.lock:
+            self.processes.discard(proc)
+
+
+class JobScheduler:
+    def __init__(self, max_per_formatter=2):
+        self.max_per_formatter = max_per_formatter
+        self.lock = threading.Lock()
+        self.pending = collections.OrderedDict()
+        self.running = {}
+        self.active = collections.Counter()
+
+    def submit(self, job):
+        # --------------------------------------------------------------------------------
+        # a job replaces anything still waiting for the same key and cancels the one that
+        # is running, the new job starts once that one has wound down
+        # --------------------------------------------------------------------------------
+        with self.lock:
+            superseded = self.pending.pop(job.key, None)
+            self.pending[job.key] = job
+            running = self.running.get(job.key)
+        if superseded is not None:
+            superseded.cancel()
+            superseded.on_done(superseded, None)
+        if running is not None:
+            running.cancel()
+        self.dispatch()
+
+    def cancel(self, key):
+        with self.lock:
+            if key not in self.pending and key not in self.running:
+                return
+            pending = self.pending.pop(key, None)
+            running = self.running.get(key)
+        if pending is not None:
+            pending.cancel()
+            pending.on_done(pending, None)
+        if running is not None:
+            running.cancel()
+
+    def is_busy(self, key):
+        return key in self.pending or key in self.running
+
+    def dispatch(self):
+        with self.lock:
+            ready = []
+            for key, job in list(self.pending.items()):
+                if key in self.running:
+                    continue
+                if self.active[job.formatter] >= self.max_per_formatter:
+                    continue
+                del self.pending[key]
+                self.running[key] = job
+                self.active[job.formatter] += 1
+                ready.append(job)
+
+        for job in ready:
+            threading.Thread(target=self.run, args=(job,), daemon=True).start()
+
+    def run(self, job):
+        outcome = None
+        try:
+            job.check()
+            outcome = job.work(job)
+        except JobCancelled:
+            pass
+        except Exception as ex:
+            outcome = ex
+        finally:
+            with self.lock:
+                if self.running.get(job.key) is job:
+                    del self.running[job.key]
+                self.active[job.formatter] -= 1
+            self.dispatch()
+        job.on_done(job, None if job.cancelled else outcome)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ****************************************************************************************
+# formatter_registry.py
+#
+# This file contains the table of formatters the universal formatter knows about and the
+# lookup from a syntax to the command line that formats it. Entries can be added to or
+# overridden with the "formatters" setting, for example:
+#
+#     "formatters": [
+#         {
+#             "syntaxes": ["JavaScript", "TypeScript"],
+#             "executable": "prettier",
+#             "config": "--stdin-filepath x.ts",
+#         },
+#     ]
+#
+# Entry keys:
+#     syntaxes        list of syntax names, or a map of syntax name to extra arguments
+#     executable      name of the formatter, looked up on PATH
+#     exec setting    settings key holding a full path to the executable
+#     launcher        arguments placed before the executable (e.g. ["perl"])
+#     config setting  settings key holding the configuration arguments
+#     config          default configuration arguments, a string or a list
+#     stdin           false for formatters that rewrite a file in place, the file is
+#                     passed where "{file}" appears in the arguments (or at the end)
+#     extension       file extension for the file handed to an in-place formatter
+#     range args      arguments that limit formatting to a range of lines, "{start}" and
+#                     "{end}" are replaced with one based line numbers, repeated for each
+#                     range (e.g. ["--line-ranges={start}-{end}"])
+#
+# Author   :  Gary Ash <gary.ash@icloud.com>
+# Created  :  18-Oct-2026  9:12am
+# Modified :
+#
+# Copyright © 2026 By Gary Ash All rights reserved.
+# ****************************************************************************************
+
+import os
+import time
+import shutil
+
+default_formatters = [
+    {
+        "syntaxes": {
+            "C": ["-l", "C"],
+            "C++": ["-l", "CPP"],
+            "C#": ["-l", "CS"],
+            "Java": ["-l", "Java"],
+            "Objective-C": ["-l", "OC"],
+            "Objective-C++": ["-l", "OC++"],
+        },
+        "executable": "uncrustify",
+        "exec setting": "uncrustify exec",
+        "config setting": "uncrustify config",
+        "config": "-c /Users/garyash/.config/.uncrustify",
+    },
+    {
+        "syntaxes": ["Perl"],
+        "executable": "perltidy",
+        "exec setting": "perltidy exec",
+        "launcher": ["perl"],
+        "config setting": "perltidy config",
+        "config": "-pro=/Users/garyash/.config/.perltidyrc -st",
+    },
+    {
+        "syntaxes": ["Swift"],
+        "executable": "swiftformat",
+        "exec setting": "swiftformat exec",
+        "config setting": "swiftformat config",
+        "config": "--config /Users/garyash/.config/.swiftformat",
+    },
+    {
+        "syntaxes": ["Go"],
+        "executable": "gofmt",
+        "exec setting": "go exec",
+        "config setting": "go config",
+        "config": "",
+    },
+    {
+        "syntaxes": ["Python"],
+        "executable": "black",
+        "exec setting": "python exec",
+        "config setting": "python config",
+        "config": "--config /Users/garyash/.config/black -",
+        "range args": ["--line-ranges={start}-{end}"],
+    },
+    {
+        "syntaxes": ["Ruby"],
+        "executable": "rbprettier",
+        "exec setting": "ruby exec",
+        "config setting": "ruby config",
+        "config": "",
+    },
+    {
+        "syntaxes": ["Bash"],
+        "executable": "shfmt",
+        "exec setting": "shfmt exec",
+        "config setting": "shfmt config",
+        "config": "-ln bash -i 0 -s -ci -",
+    },
+]
+
+resolved_executables = {}
+
+
+def file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def resolve_executable(configured, name, retry_missing=60):
+    # ------------------------------------------------------------------------------------
+    # a resolved path is reused for as long as PATH and the executable's modification
+    # time stay the same, a formatter that was not found is looked for again after a
+    # minute in case it has been installed since
+    # ------------------------------------------------------------------------------------
+    search_path = os.environ.get("PATH", "")
+    key = (configured, name)
+    if key in resolved_executables:
+        (path, cached_search_path, mtime, checked) = resolved_executables[key]
+        if cached_search_path == search_path and file_mtime(path) == mtime:
+            if path or time.time() - checked < retry_missing:
+                return path
+
+    if configured and os.path.isfile(configured):
+        path = configured
+    else:
+        path = shutil.which(os.path.basename(configured) if configured else name)
+        if path is None:
+            path = ""
+
+    resolved_executables[key] = (path, search_path, file_mtime(path), time.time())
+    return path
+
+
+class FormatterRegistry:
+    def __init__(self, settings=None):
+        self.reload(settings if settings is not None else {})
+
+    def reload(self, settings):
+        # --------------------------------------------------------------------------------
+        # user entries are applied after the defaults so they win for any syntax they name
+        # --------------------------------------------------------------------------------
+        self.settings = settings
+        self.entries = {}
+        self.commands = {}
+        for entry in default_formatters + list(settings.get("formatters", None) or []):
+            syntaxes = entry.get("syntaxes", [])
+            if not isinstance(syntaxes, dict):
+                syntaxes = dict((syntax, []) for syntax in syntaxes)
+            for syntax, syntax_args in syntaxes.items():
+                self.entries[syntax] = (entry, list(syntax_args))
+
+    def supports(self, syntax):
+        return syntax in self.entries
+
+    def syntaxes(self):
+        return list(self.entries)
+
+    def command(self, syntax, on_resolved=None):
+        # --------------------------------------------------------------------------------
+        # only the arguments are kept between calls, the executable goes through
+        # resolve_executable every time so a formatter that has been upgraded, moved or
+        # removed is noticed
+        # --------------------------------------------------------------------------------
+        if syntax not in self.commands:
+            if syntax not in self.entries:
+                return None
+            self.commands[syntax] = self.build(syntax)
+
+        (command, index, configured, name, settings_key) = self.commands[syntax]
+        formatter_path = resolve_executable(configured, name)
+        if formatter_path and formatter_path != configured and settings_key:
+            if on_resolved is not None:
+                on_resolved(settings_key, formatter_path)
+
+        command = list(command)
+        command[index] = formatter_path or name
+        return command
+
+    def formatter_name(self, syntax):
+        if syntax not in self.entries:
+            return None
+        return self.entries[syntax][0].get("executable", "")
+
+    def range_args(self, syntax):
+        if syntax not in self.entries:
+            return None
+        return self.entries[syntax][0].get("range args")
+
+    def build(self, syntax):
+        # --------------------------------------------------------------------------------
+        # returns (arguments, index of the executable in them, configured path,
+        # executable name, settings key)
+        # --------------------------------------------------------------------------------
+        (entry, syntax_args) = self.entries[syntax]
+        name = entry.get("executable", "")
+        settings_key = entry.get("exec setting")
+
+        configured = ""
+        if settings_key:
+            configured = self.settings.get(settings_key, "") or ""
+
+        config = entry.get("config", "")
+        if entry.get("config setting"):
+            config = self.settings.get(entry["config setting"], config)
+        if isinstance(config, str):
+            config = config.split()
+
+        command = list(entry.get("launcher", []))
+        index = len(command)
+        command.append(name)
+        command.extend(syntax_args)
+        command.extend(config)
+
+        if entry.get("stdin", True) is False:
+            placeholder = "{file%s}" % entry.get("extension", "")
+            if "{file}" in command:
+                command = [placeholder if arg == "{file}" else arg for arg in command]
+            else:
+                command.append(placeholder)
+        return (command, index, configured, name, settings_key)
@@ -0,0 +1,576 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ****************************************************************************************
+# header_engine.py
+#
+# This file contains the file header logic without any ties to Sublime Text: rendering a
+# header for a syntax, deciding whether a header is one of mine and working out the edits
+# that bring it up to date. The editor commands and the bulk updater both use it.
+#
+# Headers can be inserted or refreshed across whole trees from the Packages directory:
+#     python3 -m sublime_geedbla.header_engine [--insert] [--dry-run] [--jobs N] folder ...
+#
+# Author   :  Gary Ash <gary.ash@icloud.com>
+# Created  :  18-Oct-2026  9:12am
+# Modified :
+#
+# Copyright © 2026 By Gary Ash All rights reserved.
+# ****************************************************************************************
+
+import os
+import sys
+import codecs
+import shutil
+import difflib
+import datetime
+import argparse
+import concurrent.futures
+
+from . import batch_runner
+from . import header_parser
+from . import header_template
+from . import package_settings
+from .batch_format import language_extensions, skipped_folders
+
+shebangs = {
+    "Perl": "perl",
+    "Python": "python3",
+    "Ruby": "ruby",
+    "Awk": "awk",
+    "AppleScript": "osascript",
+    "AppleScript (Binary)": "osascript",
+}
+
+# ----------------------------------------------------------------------------------------
+# what utilities.get_comment gives for these syntaxes in the editor, used when there is no
+# view to ask
+# ----------------------------------------------------------------------------------------
+comment_delimiters = {
+    "C": ("/*", "*/"),
+    "C++": ("/*", "*/"),
+    "C#": ("/*", "*/"),
+    "Objective-C": ("/*", "*/"),
+    "Objective-C++": ("/*", "*/"),
+    "Java": ("/*", "*/"),
+    "Go": ("/*", "*/"),
+    "Swift": ("/*", "*/"),
+    "JavaScript": ("/*", "*/"),
+    "TypeScript": ("/*", "*/"),
+    "CSS": ("/*", "*/"),
+    "Perl": ("#", ""),
+    "Python": ("# ", ""),
+    "Ruby": ("#", ""),
+    "Bash": ("#", ""),
+    "Awk": ("#", ""),
+    "AppleScript": ("(*", "*)"),
+}
+
+header_extensions = dict(language_extensions)
+header_extensions.update(
+    {
+        ".zsh": "Bash",
+        ".awk": "Awk",
+        ".js": "JavaScript",
+        ".mjs": "JavaScript",
+        ".ts": "TypeScript",
+        ".css": "CSS",
+        ".applescript": "AppleScript",
+    }
+)
+
+templates = header_template.TemplateCache()
+default_template = header_template.CompiledTemplate(header_template.default_header)
+
+
+def header_identity(settings):
+    # ------------------------------------------------------------------------------------
+    # settings is a snapshot or the plain dict read by the command line, either way the
+    # defaults are the ones the editor uses
+    # ------------------------------------------------------------------------------------
+    if not isinstance(settings, package_settings.SettingsSnapshot):
+        settings = package_settings.SettingsSnapshot(settings)
+    return {
+        "author": settings.author,
+        "email": settings.email_address,
+        "organizations": settings.organizations,
+        "organization": settings.organization,
+        "line_length": settings.line_length,
+    }
+
+
+def find_template(user_folder, project_folders, syntax):
+    candidates = header_template.template_candidates(
+        user_folder, project_folders, syntax
+    )
+    template = templates.find(candidates)
+    return template if template is not None else default_template
+
+
+def format_timestamp(now, timestamp_format):
+    timestamp = now.strftime(timestamp_format)
+    timestamp = timestamp.replace("AM", "am")
+    return timestamp.replace("PM", "pm")
+
+
+def render_header(
+    syntax,
+    comment,
+    template,
+    identity,
+    file_name,
+    now,
+    column=0,
+    do_value_replacement=True,
+):
+    (comment_start, comment_end) = comment
+    line_length = identity["line_length"]
+
+    single_line_comment = comment_start
+    if len(comment_end) > 0:
+        top_line = comment_start.ljust(line_length - column, "*")
+        inner_line = " *"
+        last_line = " " + comment_end.rjust(line_length - 1 - column, "*")
+    else:
+        top_line = single_line_comment.ljust(line_length - column, "*")
+        inner_line = comment_start.strip()
+        last_line = single_line_comment.ljust(line_length - column, "*")
+
+    if file_name is None:
+        file_name = "<Untitled-File>"
+
+    syntax_shebangs = dict(shebangs)
+    the_shell = os.environ.get("SHELL", "")
+    if len(the_shell) > 0:
+        syntax_shebangs["Bash"] = os.path.basename(the_shell)
+    else:
+        syntax_shebangs["Bash"] = "bash"
+
+    if syntax in syntax_shebangs:
+        landing_line = 3
+        header = "#!/usr/bin/env " + syntax_shebangs[syntax] + "\n"
+        if syntax == "Python" or syntax == "Ruby":
+            landing_line = 4
+            header += "# -*- coding: utf-8 -*-\n"
+    else:
+        landing_line = 2
+        header = ""
+
+    values = {
+        "top_line": top_line,
+        "inner_line": inner_line,
+        "last_line": last_line,
+    }
+
+    if do_value_replacement:
+        values.update(
+            {
+                "FILENAME_PLACEHOLDER": os.path.basename(file_name),
+                "YEAR_PLACEHOLDER": str(now.year),
+                "TIMESTAMP_PLACEHOLDER": format_timestamp(now, "%_d-%b-%Y  %_I:%M%p"),
+                "AUTHOR_PLACEHOLDER": identity["author"],
+                "EMAIL_PLACEHOLDER": identity["email"],
+                "ORGANIZATION_PLACEHOLDER": identity["organization"],
+                "___ORGANIZATIONNAME___": identity["organization"],
+            }
+        )
+
+    header += template.render(values)
+    return (landing_line, header)
+
+
+def always_comment(point):
+    return True
+
+
+def comment_checker(head, comment):
+    # ------------------------------------------------------------------------------------
+    # stands in for the editor's scope check, a point is in a comment when its line starts
+    # with the comment marker or a block comment is open at that point
+    # ------------------------------------------------------------------------------------
+    comment_start = comment[0].strip()
+    comment_end = comment[1].strip()
+
+    def in_comment(point):
+        line_start = head.rfind("\n", 0, point) + 1
+        line = head[line_start : header_parser.line_end(head, point)]
+        if comment_start and line.lstrip().startswith(comment_start):
+            return True
+        if comment_end:
+            opened = head.rfind(comment_start, 0, point)
+            return opened >= 0 and opened > head.rfind(comment_end, 0, point)
+        return False
+
+    return in_comment
+
+
+def header_organization(copyrightStr, organizations, organization):
+    # ------------------------------------------------------------------------------------
+    # the organization a header belongs to, None when the header is not one of mine
+    # ------------------------------------------------------------------------------------
+    for org in organizations or []:
+        if org in copyrightStr:
+            return org
+    if "___ORGANIZATIONNAME___" in copyrightStr:
+        return organization
+    return None
+
+
+def copyright_edit(fields, organization, now):
+    (start, end, copyrightStr) = fields["copyright"]
+    year = header_parser.copyright_year.search(copyrightStr)
+    if year is None:
+        return None
+    last_year = year.group()
+
+    if int(last_year) < now.year:
+        s = "Copyright © %s-%d By %s All rights reserved." % (
+            last_year,
+            now.year,
+            organization,
+        )
+    else:
+        s = "Copyright © %s By %s All rights reserved." % (last_year, organization)
+    return (start, end, s)
+
+
+def file_name_edit(head, fields, hdr, file_name, in_comment=always_comment):
+    if file_name is None:
+        return None
+
+    new_file_name = os.path.basename(file_name)
+    untitled = fields.get("untitled")
+    if untitled is not None and in_comment(untitled[0]):
+        return (untitled[0], untitled[1], new_file_name)
+
+    new_file_name_location = hdr.find(new_file_name)
+    if new_file_name_location > 0:
+        file_name_search = hdr[0 : new_file_name_location - 1]
+        found = head.find(file_name_search)
+        if found >= 0 and in_comment(found):
+            start = found + len(file_name_search) + 1
+            end = header_parser.line_end(head, start)
+            if start <= end:
+                return (start, end, new_file_name)
+    return None
+
+
+def created_edit(fields, in_comment=always_comment):
+    # ------------------------------------------------------------------------------------
+    # only old style m/d/y creation dates are rewritten
+    # ------------------------------------------------------------------------------------
+    created_field = fields.get("created")
+    if created_field is None or not in_comment(created_field[0]):
+        return None
+
+    (start, end, createdStr) = created_field
+    dateStr = createdStr.split(":", 1)[1]
+    if "/" not in dateStr:
+        return None
+    created = header_parser.parse_old_timestamp(dateStr)
+    if created is None:
+        return None
+    return (start, end, format_timestamp(created, "Created  :  %_e-%b-%Y %_I:%M%p"))
+
+
+def modified_edit(fields, now, in_comment=always_comment):
+    modified_field = fields.get("modified")
+    if modified_field is None or not in_comment(modified_field[0]):
+        return None
+    timestamp = format_timestamp(now, "Modified :  %_e-%b-%Y %_I:%M%p")
+    return (modified_field[0], modified_field[1], timestamp)
+
+
+def author_edit(head, fields, hdr, identity, in_comment=always_comment):
+    author_field = fields.get("author")
+    if author_field is None or not in_comment(author_field[0]):
+        return None
+
+    (start, end, original_author_line) = author_field
+    new_author_location = header_parser.author_line.search(hdr)
+    if new_author_location is None:
+        return (start, end, "")
+
+    new_author_line = new_author_location.group()
+    matches = header_parser.author_details.match(original_author_line)
+    if matches is None:
+        return None
+
+    author_name = matches.group(4)
+    author_email = matches.group(5)
+    if author_name == identity["author"] and author_email != identity["email"]:
+        return (start, end, new_author_line)
+
+    if author_name != identity["author"]:
+        if "Author" in original_author_line:
+            new_author_search = original_author_line.replace("Author", "      ")
+        if "Programmer" in original_author_line:
+            new_author_search = original_author_line.replace("Programmer", "          ")
+
+        if head.find(new_author_search) < 0:
+            return (start, end, new_author_line + "\n" + new_author_search)
+    return None
+
+
+def header_edits(
+    head,
+    fields,
+    hdr,
+    file_name,
+    identity,
+    organization,
+    now,
+    in_comment=always_comment,
+    modified=True,
+):
+    edits = [
+        copyright_edit(fields, organization, now),
+        file_name_edit(head, fields, hdr, file_name, in_comment),
+        created_edit(fields, in_comment),
+        modified_edit(fields, now, in_comment) if modified else None,
+        author_edit(head, fields, hdr, identity, in_comment),
+    ]
+    return [edit for edit in edits if edit is not None]
+
+
+def apply_edits(text, edits):
+    for start, end, replacement in sorted(edits, reverse=True):
+        text = text[:start] + replacement + text[end:]
+    return text
+
+
+def read_head(path):
+    # ------------------------------------------------------------------------------------
+    # returns (head text, number of bytes it came from), a multibyte character cut in two
+    # at the end of the read is left for the rest of the file
+    # ------------------------------------------------------------------------------------
+    with open(path, "rb") as fileHandle:
+        data = fileHandle.read(header_parser.head_size)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    head = header_parser.header_head(decoder.decode(data))
+    return (head, len(head.encode("utf-8")))
+
+
+def rewrite_head(path, head_bytes, new_head):
+    # ------------------------------------------------------------------------------------
+    # the new head and the untouched rest of the file go to a temporary file that then
+    # replaces the original, the rest is copied in chunks rather than read in
+    # ------------------------------------------------------------------------------------
+    def write(output):
+        output.write(new_head.encode("utf-8"))
+        with open(path, "rb") as source:
+            source.seek(head_bytes)
+            shutil.copyfileobj(source, output, 1024 * 1024)
+
+    batch_runner.write_atomically(path, write, keep_mode=True)
+
+
+def inserted_head(head, header):
+    # ------------------------------------------------------------------------------------
+    # a file that already starts with a #! line keeps it (and a coding line after it), the
+    # header's own copies of those lines are dropped, the header takes on the file's own
+    # line endings
+    # ------------------------------------------------------------------------------------
+    newline = header_parser.newline_style(head)
+    if not header.endswith("\n"):
+        header = header.rstrip(" ") + "\n"
+    header = header.replace("\n", newline)
+    if not head.startswith("#!"):
+        return header + head
+
+    lines = head.splitlines(True)
+    keep = 1
+    if len(lines) > 1 and "coding" in lines[1] and lines[1].startswith("#"):
+        keep = 2
+    header_lines = header.splitlines(True)
+    while header_lines and (
+        header_lines[0].startswith("#!") or header_lines[0].startswith("# -*-")
+    ):
+        header_lines.pop(0)
+    prefix = "".join(lines[:keep])
+    if not prefix.endswith("\n"):
+        prefix += newline
+    return prefix + "".join(header_lines) + "".join(lines[keep:])
+
+
+def update_file(path, syntax, options):
+    # ------------------------------------------------------------------------------------
+    # runs in a pool worker, returns (status, bytes read, diff or error) where status is
+    # one of "updated", "inserted", "unchanged", "skipped" or "failed"
+    # ------------------------------------------------------------------------------------
+    try:
+        (head, head_bytes) = read_head(path)
+        comment = comment_delimiters.get(syntax, ("#", ""))
+        identity = options["identity"]
+        now = options["now"]
+        template = find_template(
+            options["user_folder"], options["project_folders"], syntax
+        )
+        (_, hdr) = render_header(syntax, comment, template, identity, path, now)
+
+        fields = header_parser.parse_header(head)
+        if fields is None:
+            if not options["insert"]:
+                return ("skipped", head_bytes, None)
+            status = "inserted"
+            new_head = inserted_head(head, hdr)
+        else:
+            organization = header_organization(
+                fields["copyright"][2],
+                identity["organizations"],
+                identity["organization"],
+            )
+            if organization is None:
+                return ("skipped", head_bytes, None)
+            in_comment = comment_checker(head, comment)
+            if not in_comment(fields["copyright"][0]):
+                return ("skipped", head_bytes, None)
+
+            edits = header_edits(
+                head,
+                fields,
+                hdr,
+                path,
+                identity,
+                organization,
+                now,
+                in_comment,
+                modified=options["modified"],
+            )
+            # ----------------------------------------------------------------------------
+            # the header is rendered with \n, replacements follow the file's line endings
+            # ----------------------------------------------------------------------------
+            newline = header_parser.newline_style(head)
+            if newline != "\n":
+                edits = [
+                    (start, end, text.replace("\n", newline))
+                    for (start, end, text) in edits
+                ]
+            status = "updated"
+            new_head = apply_edits(head, edits)
+
+        if new_head == head:
+            return ("unchanged", head_bytes, None)
+
+        if options["dry_run"]:
+            diff = "".join(
+                difflib.unified_diff(
+                    head.splitlines(True),
+                    new_head.splitlines(True),
+                    path,
+                    path,
+                )
+            )
+            return (status, head_bytes, diff)
+
+        rewrite_head(path, head_bytes, new_head)
+        return (status, head_bytes, None)
+    except Exception as ex:
+        return ("failed", 0, str(ex))
+
+
+def header_files(roots):
+    for root in roots:
+        if os.path.isfile(root):
+            syntax = header_extensions.get(os.path.splitext(root)[1].lower())
+            if syntax is not None:
+                yield (root, syntax)
+            continue
+        for folder, folders, names in os.walk(root):
+            folders[:] = [f for f in folders if f not in skipped_folders]
+            for name in names:
+                syntax = header_extensions.get(os.path.splitext(name)[1].lower())
+                if syntax is not None:
+                    yield (os.path.join(folder, name), syntax)
+
+
+def run_headers(
+    roots,
+    identity,
+    user_folder,
+    executor_class=concurrent.futures.ProcessPoolExecutor,
+    jobs=None,
+    insert=False,
+    dry_run=False,
+    modified=False,
+    progress=None,
+):
+    summary = batch_runner.new_summary(["updated", "inserted", "unchanged", "skipped"])
+    summary["diffs"] = []
+    summary["bytes"] = 0
+    summary["dry run"] = dry_run
+    options = {
+        "identity": identity,
+        "user_folder": user_folder,
+        "project_folders": [root for root in roots if os.path.isdir(root)],
+        "now": datetime.datetime.now(),
+        "insert": insert,
+        "dry_run": dry_run,
+        "modified": modified,
+    }
+
+    def tasks():
+        for path, syntax in header_files(roots):
+            path = os.path.abspath(path)
+            yield (path, update_file, (path, syntax, options))
+
+    def on_result(path, result):
+        (status, head_bytes, detail) = result
+        summary["bytes"] += head_bytes
+        if status != "failed" and detail:
+            summary["diffs"].append(detail)
+
+    batch_runner.run(summary, tasks(), executor_class, jobs, progress, on_result)
+    summary["diffs"].sort()
+    return summary
+
+
+def report(summary):
+    to_be = "to be " if summary["dry run"] else ""
+    return batch_runner.report(
+        summary,
+        [
+            (to_be + "updated", "updated"),
+            (to_be + "inserted", "inserted"),
+            ("unchanged", "unchanged"),
+            ("skipped", "skipped"),
+        ],
+        [("%.1f KB/s of headers read", summary["bytes"] / 1024)],
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="header_engine",
+        description="Insert or update Gee Dbl A file headers across source trees",
+    )
+    parser.add_argument("folders", nargs="+", help="folders or files to update")
+    parser.add_argument("--settings", default=package_settings.default_settings_path())
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument(
+        "--insert", action="store_true", help="add a header to files without one"
+    )
+    parser.add_argument(
+        "--modified", action="store_true", help="also set the modification time stamp"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="print the changes, write nothing"
+    )
+    args = parser.parse_args(argv)
+
+    summary = run_headers(
+        args.folders,
+        header_identity(package_settings.load_settings_file(args.settings)),
+        os.path.join(package_settings.packages_dir(), "User"),
+        jobs=args.jobs,
+        insert=args.insert,
+        dry_run=args.dry_run,
+        modified=args.modified,
+    )
+    for diff in summary["diffs"]:
+        sys.stdout.write(diff)
+    print(report(summary))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ****************************************************************************************
+# header_index.py
+#
+# This file contains a small SQLite index of the header fields of every source file in a
+# set of folders (organization, copyright years, time stamps and author) so questions like
+# "which files still say 2023" are answered without opening any files. The index is kept
+# up to date from save events and from scans that only read files whose modification time
+# or size has changed.
+#
+# Author   :  Gary Ash <gary.ash@icloud.com>
+# Created  :  18-Oct-2026  9:12am
+# Modified :
+#
+# Copyright © 2026 By Gary Ash All rights reserved.
+# ****************************************************************************************
+
+import os
+import re
+import sqlite3
+import threading
+
+from . import header_parser
+from . import header_engine
+
+schema = """
+create table if not exists headers (
+    path text primary key,
+    mtime_ns integer,
+    size integer,
+    has_header integer,
+    copyright text,
+    organization text,
+    first_year integer,
+    last_year integer,
+    created text,
+    modified text,
+    author text,
+    email text
+)
+"""
+
+copyright_years = re.compile(r"(?:19|20)[0-9]{2}")
+author_value = re.compile(r"(?:Programmer|Author)[^:]*:\s*([^<]*?)\s*(<[^>]*>)?\s*$")
+
+# ----------------------------------------------------------------------------------------
+# the questions the index can answer, each is (caption, where clause), "?" is filled in
+# with the year or author the question is about
+# ----------------------------------------------------------------------------------------
+queries = [
+    ("Copyright not updated for this year", "has_header and last_year < ?"),
+    ("Files without a header", "not has_header"),
+    ("Headers written by someone else", "has_header and author != ?"),
+    ("Headers for another organization", "has_header and organization is null"),
+    ("All headers", "has_header"),
+]
+
+
+def stamp(fields, name):
+    if name not in fields:
+        return None
+    value = fields[name][2].split(":", 1)
+    return value[1].strip() if len(value) > 1 else ""
+
+
+def header_record(head, identity):
+    # ------------------------------------------------------------------------------------
+    # the columns for one file, everything but has_header is None when there is no header
+    # ------------------------------------------------------------------------------------
+    record = {
+        "has_header": 0,
+        "copyright": None,
+        "organization": None,
+        "first_year": None,
+        "last_year": None,
+        "created": None,
+        "modified": None,
+        "author": None,
+        "email": None,
+    }
+    fields = header_parser.parse_header(head)
+    if fields is None:
+        return record
+
+    copyrightStr = fields["copyright"][2]
+    years = [int(year) for year in copyright_years.findall(copyrightStr)]
+    record.update(
+        {
+            "has_header": 1,
+            "copyright": copyrightStr,
+            "organization": header_engine.header_organization(
+                copyrightStr, identity["organizations"], identity["organization"]
+            ),
+            "first_year": min(years) if years else None,
+            "last_year": max(years) if years else None,
+            "created": stamp(fields, "created"),
+            "modified": stamp(fields, "modified"),
+        }
+    )
+    if "author" in fields:
+        author = author_value.search(fields["author"][2])
+        if author is not None:
+            record["author"] = author.group(1)
+            record["email"] = (author.group(2) or "").strip("<>") or None
+    return record
+
+
+class HeaderIndex:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(schema)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def read_row(self, path, identity, info=None):
+        # --------------------------------------------------------------------------------
+        # the row for one file or None when it can no longer be read
+        # --------------------------------------------------------------------------------
+        try:
+            if info is None:
+                info = os.stat(path)
+            (head, _) = header_engine.read_head(path)
+        except (OSError, UnicodeDecodeError):
+            return None
+
+        record = header_record(head, identity)
+        return (
+            path,
+            info.st_mtime_ns,
+            info.st_size,
+            record["has_header"],
+            record["copyright"],
+            record["organization"],
+            record["first_year"],
+            record["last_year"],
+            record["created"],
+            record["modified"],
+            record["author"],
+            record["email"],
+        )
+
+    def write_rows(self, rows, removed=()):
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "insert or replace into headers values "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.connection.executemany(
+                "delete from headers where path = ?", [(path,) for path in removed]
+            )
+
+    def update_file(self, path, identity, info=None):
+        path = os.path.abspath(path)
+        row = self.read_row(path, identity, info)
+        if row is None:
+            self.remove_file(path)
+        else:
+            self.write_rows([row])
+
+    def remove_file(self, path):
+        self.write_rows([], [path])
+
+    def has_files(self, roots):
+        with self.lock:
+            for root in roots:
+                prefix = os.path.join(os.path.abspath(root), "")
+                if self.connection.execute(
+                    "select 1 from headers where substr(path, 1, ?) = ? limit 1",
+                    (len(prefix), prefix),
+                ).fetchone():
+                    return True
+        return False
+
+    def scan(self, roots, identity, progress=None):
+        # --------------------------------------------------------------------------------
+        # only files that are new or whose modification time or size changed are read,
+        # rows for files that have gone away are dropped, everything is written in one
+        # transaction at the end, returns the number read
+        # --------------------------------------------------------------------------------
+        roots = [os.path.abspath(root) for root in roots]
+        known = {}
+        with self.lock:
+            for root in roots:
+                prefix = os.path.join(root, "")
+                for path, mtime_ns, size in self.connection.execute(
+                    "select path, mtime_ns, size from headers "
+                    "where substr(path, 1, ?) = ?",
+                    (len(prefix), prefix),
+                ):
+                    known[path] = (mtime_ns, size)
+
+        seen = set()
+        rows = []
+        removed = []
+        read = 0
+        for path, _ in header_engine.header_files(roots):
+            path = os.path.abspath(path)
+            seen.add(path)
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            if known.get(path) == (info.st_mtime_ns, info.st_size):
+                continue
+            row = self.read_row(path, identity, info)
+            if row is None:
+                removed.append(path)
+            else:
+                rows.append(row)
+            read += 1
+            if progress is not None and read % 100 == 0:
+                progress(read)
+
+        removed.extend(set(known) - seen)
+        self.write_rows(rows, removed)
+        self.refresh_organizations(identity)
+        return read
+
+    def refresh_organizations(self, identity):
+        # --------------------------------------------------------------------------------
+        # the organizations setting may have changed since a file was read, the stored
+        # copyright line is enough to work the match out again
+        # --------------------------------------------------------------------------------
+        with self.lock, self.connection:
+            rows = self.connection.execute(
+                "select path, copyright, organization from headers where has_header"
+            ).fetchall()
+            changes = []
+            for path, copyrightStr, organization in rows:
+                matched = header_engine.header_organization(
+                    copyrightStr, identity["organizations"], identity["organization"]
+                )
+                if matched != organization:
+                    changes.append((matched, path))
+            self.connection.executemany(
+                "update headers set organization = ? where path = ?", changes
+            )
+
+    def query(self, index, roots, argument=None):
+        # --------------------------------------------------------------------------------
+        # rows of (path, copyright, author, modified) for one of the queries above limited
+        # to files under roots
+        # --------------------------------------------------------------------------------
+        (_, where) = queries[index]
+        parameters = [argument] if "?" in where else []
+        folders = []
+        for root in roots:
+            prefix = os.path.join(os.path.abspath(root), "")
+            folders.append("substr(path, 1, ?) = ?")
+            parameters.extend([len(prefix), prefix])
+        if folders:
+            where = "(%s) and (%s)" % (where, " or ".join(folders))
+
+        with self.lock:
+            return self.connection.execute(
+                "select path, copyright, author, modified from headers where %s "
+                "order by path" % where,
+                parameters,
+            ).fetchall()
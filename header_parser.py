@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ****************************************************************************************
+# header_parser.py
+#
+# This file contains the parser that picks the fields out of a file header comment. Only
+# the head of the file is looked at and all of the fields are found in one regex pass so
+# a file without a header costs next to nothing to check
+#
+# Author   :  Gary Ash <gary.ash@icloud.com>
+# Created  :  18-Oct-2026  9:12am
+# Modified :
+#
+# Copyright © 2026 By Gary Ash All rights reserved.
+# ****************************************************************************************
+
+import re
+import datetime
+
+head_size = 8192
+head_lines = 40
+
+# ----------------------------------------------------------------------------------------
+# fields stop short of a \r so the line endings of CRLF files are left as they are
+# ----------------------------------------------------------------------------------------
+header_field = re.compile(
+    r"(?P<copyright>\x43opyright © [^\r\n]*? By [^\r\n]* All rights reserved\.)"
+    r"|(?P<untitled><Untitled-File>)"
+    r"|(?P<created>\x43reated[^\r\n]*:[^\r\n]*(?=\r?$))"
+    r"|(?P<modified>\x4Dodified[^\r\n]*:[^\r\n]*(?=\r?$))"
+    r"|(?P<author>^[^\r\n]*(?:Programmer|Author)[^\r\n]*:[^\r\n]*(?=\r?$))",
+    re.MULTILINE,
+)
+copyright_year = re.compile(r"20[0-9]*")
+author_line = re.compile(r"(.*)(Programmer|Author)(.*:)(.*)")
+author_details = re.compile(
+    r"(.*(Programmer|Author)(.*:\s*))([A-z0-9]*\s*[A-z0-9]*)\s*(<[A-z0-9.]*@[A-z0-9.]*>)"
+)
+old_timestamp_formats = [
+    "%m/%d/%Y %I:%M%p",
+    "%m/%d/%Y %I:%M %p",
+    "%m/%d/%Y %H:%M",
+    "%m/%d/%Y",
+    "%m/%d/%y",
+]
+
+
+def header_head(text, max_lines=head_lines):
+    end = -1
+    for _ in range(max_lines):
+        end = text.find("\n", end + 1)
+        if end < 0:
+            return text
+    return text[: end + 1]
+
+
+def parse_header(head):
+    # ------------------------------------------------------------------------------------
+    # returns None when there is no copyright notice in the head, otherwise a dictionary
+    # of field name to (start, end, text) for the first occurrence of each field found
+    # ------------------------------------------------------------------------------------
+    if "\x43opyright ©" not in head:
+        return None
+
+    fields = {}
+    for match in header_field.finditer(head):
+        if match.lastgroup not in fields:
+            fields[match.lastgroup] = (match.start(), match.end(), match.group())
+    if "copyright" not in fields:
+        return None
+    return fields
+
+
+def line_end(text, position):
+    end = text.find("\n", position)
+    if end < 0:
+        return len(text)
+    if end > position and text[end - 1] == "\r":
+        end -= 1
+    return end
+
+
+def newline_style(text):
+    end = text.find("\n")
+    return "\r\n" if end > 0 and text[end - 1] == "\r" else "\n"
+
+
+def parse_old_timestamp(text):
+    text = " ".join(text.split())
+    for timestamp_format in old_timestamp_formats:
+        try:
+            return datetime.datetime.strptime(text, timestamp_format)
+        except ValueError:
+            pass
+    return None
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ****************************************************************************************
+# header_template.py
+#
+# This file contains the file header template engine. A template is split once into its
+# literal text and placeholders so rendering it is a single join, compiled templates are
+# kept until the file they came from changes. Templates are looked for in this order:
+#
+#     <project folder>/.sublime_geedbla_file_header.<syntax>.txt
+#     <project folder>/.sublime_geedbla_file_header.txt
+#     Packages/User/sublime_geedbla_file_header.<syntax>.txt
+#     Packages/User/sublime_geedbla_file_header.txt
+#
+# Author   :  Gary Ash <gary.ash@icloud.com>
+# Created  :  18-Oct-2026  9:12am
+# Modified :
+#
+# Copyright © 2026 By Gary Ash All rights reserved.
+# ****************************************************************************************
+
+import os
+import re
+
+placeholders = [
+    "top_line",
+    "inner_line",
+    "last_line",
+    "FILENAME_PLACEHOLDER",
+    "YEAR_PLACEHOLDER",
+    "TIMESTAMP_PLACEHOLDER",
+    "AUTHOR_PLACEHOLDER",
+    "EMAIL_PLACEHOLDER",
+    "ORGANIZATION_PLACEHOLDER",
+    "___ORGANIZATIONNAME___",
+]
+placeholder_pattern = re.compile("|".join(re.escape(key) for key in placeholders))
+template_name = "sublime_geedbla_file_header"
+
+default_header = """top_line
+inner_line FILENAME_PLACEHOLDER
+inner_line
+inner_line
+inner_line
+inner_line Author   :  AUTHOR_PLACEHOLDER <EMAIL_PLACEHOLDER>
+inner_line Created  :  TIMESTAMP_PLACEHOLDER
+inner_line Modified :
+inner_line
+inner_line Copyright © YEAR_PLACEHOLDER By ORGANIZATION_PLACEHOLDER All rights reserved.
+last_line """
+
+
+class CompiledTemplate:
+    def __init__(self, text):
+        # --------------------------------------------------------------------------------
+        # even entries are literal text and odd entries are placeholder names
+        # --------------------------------------------------------------------------------
+        self.segments = []
+        position = 0
+        for match in placeholder_pattern.finditer(text):
+            self.segments.append(text[position : match.start()])
+            self.segments.append(match.group())
+            position = match.end()
+        self.segments.append(text[position:])
+
+    def render(self, values):
+        # --------------------------------------------------------------------------------
+        # a placeholder without a value is left in the text as it is
+        # --------------------------------------------------------------------------------
+        return "".join(
+            values.get(segment, segment) if index % 2 else segment
+            for index, segment in enumerate(self.segments)
+        )
+
+
+def template_candidates(user_folder, project_folders, syntax):
+    candidates = []
+    for folder in project_folders:
+        candidates.append(os.path.join(folder, ".%s.%s.txt" % (template_name, syntax)))
+        candidates.append(os.path.join(folder, ".%s.txt" % (template_name)))
+    candidates.append(os.path.join(user_folder, "%s.%s.txt" % (template_name, syntax)))
+    candidates.append(os.path.join(user_folder, "%s.txt" % (template_name)))
+    return candidates
+
+
+def is_template_file(path):
+    name = os.path.basename(path)
+    return name.startswith(template_name) or name.startswith("." + template_name)
+
+
+class TemplateCache:
+    def __init__(self):
+        self.templates = {}
+
+    def get(self, path):
+        # --------------------------------------------------------------------------------
+        # a template is only read and compiled again when its file's modification time or
+        # size changes, None when there is no such file
+        # --------------------------------------------------------------------------------
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.templates.pop(path, None)
+            return None
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self.templates.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        try:
+            with open(path, "r", encoding="utf-8") as fileHandle:
+                template = CompiledTemplate(fileHandle.read())
+        except (OSError, UnicodeDecodeError):
+            return None
+        self.templates[path] = (signature, template)
+        return template
+
+    def find(self, candidates):
+        for path in candidates:
+            template = self.get(path)
+            if template is not None:
+                return template
+        return None
@@ -4,7 +4,8 @@
 # new_from_selection.py
 #
 # This file contains the implementation of a command that will create a new buffer/file
-# containing the selected text of the current buffer
+# containing the selected text of the current buffer, or write it straight to a file when
+# the selection is too big to be worth editing
 #
 # Author   :  Gary Ash <gary.ash@icloud.com>
 # Created  :  28-Feb-2025  6:44pm
@@ -12,14 +13,92 @@
 #
 # Copyright © 2024 By Gary Ash All rights reserved.
 # ****************************************************************************************
+import os
+import sublime
+import threading
 import sublime_plugin
+from sublime_geedbla.utilities import current_settings
+
+chunk_size = 4 * 1024 * 1024
+
+
+def selection_chunks(view, regions, separator, size=chunk_size):
+    # ------------------------------------------------------------------------------------
+    # the selections in buffer order joined by separator in one pass, everything comes
+    # back as a single string unless it is bigger than size, then it is handed out in
+    # pieces of about size so a huge selection is never held in memory twice
+    # ------------------------------------------------------------------------------------
+    pieces = []
+    length = 0
+    for index, region in enumerate(regions):
+        if index > 0 and separator:
+            pieces.append(separator)
+            length += len(separator)
+        start = region.begin()
+        while start < region.end():
+            if length >= size:
+                yield "".join(pieces)
+                pieces = []
+                length = 0
+            end = min(start + size - length, region.end())
+            pieces.append(view.substr(sublime.Region(start, end)))
+            length += end - start
+            start = end
+    if pieces:
+        yield "".join(pieces)
 
 
 class NewFromSelection(sublime_plugin.TextCommand):
-    def run(self, edit):
+    def run(self, edit, separator=None, to_file=False):
+        if separator is None:
+            separator = current_settings().new_from_selection_separator
+        regions = [region for region in self.view.sel() if not region.empty()]
+
+        if to_file:
+            self.askForFile(regions, separator)
+            return
+
+        # --------------------------------------------------------------------------------
+        # the edit belongs to this view so the text goes into the new one with append, a
+        # single command unless the selection is bigger than chunk_size, every piece goes
+        # on the end so nothing already there moves
+        # --------------------------------------------------------------------------------
         output_view = self.view.window().new_file()
-        for region in self.view.sel():
-            output_view.insert(edit, 0, self.view.substr(region))
+        for chunk in selection_chunks(self.view, regions, separator):
+            output_view.run_command(
+                "append", {"characters": chunk, "force": True, "scroll_to_end": False}
+            )
+
+    def askForFile(self, regions, separator):
+        folder = os.path.dirname(self.view.file_name() or "") or os.path.expanduser("~")
+        self.view.window().show_input_panel(
+            "Write selection to:",
+            os.path.join(folder, "selection.txt"),
+            lambda path: self.writeFile(regions, separator, os.path.expanduser(path)),
+            None,
+            None,
+        )
+
+    def writeFile(self, regions, separator, path):
+        def write_in_background():
+            written = 0
+            try:
+                with open(path, "w", encoding="utf-8", newline="") as fileHandle:
+                    for chunk in selection_chunks(self.view, regions, separator):
+                        fileHandle.write(chunk)
+                        written += len(chunk)
+            except OSError as error:
+                sublime.set_timeout(
+                    lambda: sublime.error_message(
+                        "Unable to write %s\n%s" % (path, error)
+                    ),
+                    0,
+                )
+                return
+            sublime.status_message("Wrote %d characters to %s" % (written, path))
+
+        sublime.status_message("Writing selection to %s..." % path)
+        threading.Thread(target=write_in_background, daemon=True).start()
 
     def is_enabled(self):
-        return not self.view.sel()[0].empty()
+        return any(not region.empty() for region in self.view.sel())
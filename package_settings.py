@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ****************************************************************************************
+# package_settings.py
+#
+# This file contains helpers to read the package settings file outside of Sublime Text so
+# the command line tools use the same configuration as the editor, and the snapshot of the
+# settings the plugin reads its options from
+#
+# Author   :  Gary Ash <gary.ash@icloud.com>
+# Created  :  18-Oct-2026  9:12am
+# Modified :
+#
+# Copyright © 2026 By Gary Ash All rights reserved.
+# ****************************************************************************************
+
+import os
+import re
+import json
+
+settings_file_name = "sublime_geedbla.sublime-settings"
+
+# ----------------------------------------------------------------------------------------
+# Sublime settings files are JSON with comments and trailing commas, strings are matched
+# first so nothing inside them is touched
+# ----------------------------------------------------------------------------------------
+comments = re.compile(r'("(?:\\.|[^"\\])*")|//[^\n]*|/\*.*?\*/', re.DOTALL)
+trailing_commas = re.compile(r'("(?:\\.|[^"\\])*")|,(\s*[}\]])')
+
+
+def packages_dir():
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def default_settings_path():
+    return os.path.join(packages_dir(), "User", settings_file_name)
+
+
+def default_cache_dir():
+    return os.path.join(packages_dir(), "User", "sublime_geedbla.cache")
+
+
+def load_settings_file(path=None):
+    if path is None:
+        path = default_settings_path()
+    try:
+        with open(path, "r", encoding="utf-8") as fileHandle:
+            text = fileHandle.read()
+    except OSError:
+        return {}
+
+    text = comments.sub(lambda m: m.group(1) or "", text)
+    text = trailing_commas.sub(lambda m: m.group(1) or m.group(2), text)
+    try:
+        settings = json.loads(text)
+    except ValueError:
+        return {}
+    return settings if isinstance(settings, dict) else {}
+
+
+# ----------------------------------------------------------------------------------------
+# the options read on every use, each is (attribute, settings key, default), a value of
+# the wrong type is replaced by the default
+# ----------------------------------------------------------------------------------------
+snapshot_fields = [
+    ("line_length", "line_length", 90),
+    ("author", "author", "Gary Ash"),
+    ("email_address", "email", "gary.ash@icloud.com"),
+    ("organizations", "organizations", ["Gee Dbl A"]),
+    ("folders_to_open", "folders_to_open", ["/opt/geedbla"]),
+    ("formatter_timeout", "formatter timeout", 30),
+    ("formatter_concurrency", "formatter concurrency", 2),
+    ("formatter_threads", "formatter threads", 0),
+    ("formatter_workers", "formatter workers", True),
+    ("formatter_worker_idle_timeout", "formatter worker idle timeout", 300),
+    ("formatter_cache_entries", "formatter cache entries", 256),
+    ("formatter_disk_cache", "formatter disk cache", True),
+    ("formatter_disk_cache_size", "formatter disk cache size", 64),
+    ("large_buffer_threshold", "large buffer threshold", 8 * 1024 * 1024),
+    ("format_modified_since", "format modified since", "save"),
+    ("format_async", "format async", True),
+    ("preformat_syntaxes", "preformat syntaxes", []),
+    ("preformat_delay", "preformat delay", 1000),
+    ("preformat_on_battery", "preformat on battery", False),
+    ("preformat_max_load", "preformat max load", 0.75),
+    ("preformat_on_save", "preformat on save", True),
+    ("config_files_ignore", "config files ignore", []),
+    ("executable_bit_ignore", "executable bit ignore", []),
+    ("new_from_selection_separator", "new from selection separator", "\n"),
+]
+
+
+def typed_value(value, default):
+    if isinstance(default, bool):
+        return value if isinstance(value, bool) else default
+    if isinstance(default, (int, float)):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+        return default
+    if isinstance(default, list):
+        return list(value) if isinstance(value, (list, tuple)) else list(default)
+    return value if isinstance(value, type(default)) else default
+
+
+class SettingsSnapshot:
+    __slots__ = [name for (name, _, _) in snapshot_fields] + [
+        "organization",
+        "values",
+        "version",
+    ]
+
+    def __init__(self, settings, version=0):
+        # --------------------------------------------------------------------------------
+        # settings is a Sublime Settings object or a plain dict, everything is copied so
+        # later changes only show up in the next snapshot
+        # --------------------------------------------------------------------------------
+        if hasattr(settings, "to_dict"):
+            values = settings.to_dict()
+        else:
+            values = dict(settings)
+
+        set_value = object.__setattr__
+        for name, key, default in snapshot_fields:
+            set_value(self, name, typed_value(values.get(key), default))
+        set_value(
+            self,
+            "organization",
+            self.organizations[0] if self.organizations else "Gee Dbl A",
+        )
+        set_value(self, "values", values)
+        set_value(self, "version", version)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("settings snapshots cannot be changed")
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
@@ -14,14 +14,24 @@
 
 import sublime
 import sublime_plugin
+from sublime_geedbla.event_scheduler import EventScheduler
+
+scheduler = EventScheduler(delay=100)
 
 
 def plugin_loaded():
     preferred_setup()
 
 
-def preferred_setup():
-    activeWindow = sublime.active_window()
+def preferred_setup(activeWindow=None):
+    # ------------------------------------------------------------------------------------
+    # nothing is touched when the sidebar and a panel are already showing
+    # ------------------------------------------------------------------------------------
+    if activeWindow is None:
+        activeWindow = sublime.active_window()
+    if activeWindow is None or not activeWindow.is_valid():
+        return
+
     if not activeWindow.is_sidebar_visible():
         activeWindow.set_sidebar_visible(True)
 
@@ -30,13 +40,25 @@ def preferred_setup():
         activeWindow.focus_group(activeWindow.active_group())
 
 
+def schedule_preferred_setup(window=None):
+    # ------------------------------------------------------------------------------------
+    # tab switches and closing a batch of files fire these events back to back, they are
+    # collapsed into one run per window once things settle
+    # ------------------------------------------------------------------------------------
+    if window is None:
+        window = sublime.active_window()
+    if window is None:
+        return
+    scheduler.schedule(window.id(), lambda: preferred_setup(window))
+
+
 class PreferredSetupViewEventListener(sublime_plugin.EventListener):
-    def on_deactivated(self, view):
-        preferred_setup()
+    def on_deactivated_async(self, view):
+        schedule_preferred_setup(view.window())
 
     def on_close(self, view):
-        preferred_setup()
+        schedule_preferred_setup()
 
     def on_post_window_command(self, window, command_name, args):
         if command_name == "hide_panel":
-            preferred_setup()
+            schedule_preferred_setup(window)
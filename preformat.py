@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ****************************************************************************************
+# preformat.py
+#
+# This file contains the speculative formatter. Once the user stops typing the buffer is
+# formatted in the background so formatting (or saving) can apply the result straight
+# away. It is turned on per syntax with the "preformat syntaxes" setting, for example:
+#
+#     "preformat syntaxes": ["Python", "Go"],
+#
+# Author   :  Gary Ash <gary.ash@icloud.com>
+# Created  :  18-Oct-2026  9:12am
+# Modified :
+#
+# Copyright © 2026 By Gary Ash All rights reserved.
+# ****************************************************************************************
+
+import os
+import sys
+import glob
+import time
+import sublime
+import sublime_plugin
+import subprocess
+from . import run_formatter
+from .formatter_jobs import FormatJob
+from .event_scheduler import EventScheduler
+from .utilities import *
+
+power_state = {"checked": 0, "on battery": False}
+idle_timers = EventScheduler()
+
+
+def read_power_supply(path):
+    try:
+        with open(path) as fileHandle:
+            return fileHandle.read().strip()
+    except OSError:
+        return ""
+
+
+def check_battery_power():
+    if sys.platform == "darwin":
+        proc = subprocess.run(
+            ["pmset", "-g", "batt"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            timeout=5,
+        )
+        return b"Battery Power" in proc.stdout
+
+    if sys.platform == "win32":
+        import ctypes
+
+        class SystemPowerStatus(ctypes.Structure):
+            _fields_ = [
+                ("ACLineStatus", ctypes.c_ubyte),
+                ("BatteryFlag", ctypes.c_ubyte),
+                ("BatteryLifePercent", ctypes.c_ubyte),
+                ("SystemStatusFlag", ctypes.c_ubyte),
+                ("BatteryLifeTime", ctypes.c_ulong),
+                ("BatteryFullLifeTime", ctypes.c_ulong),
+            ]
+
+        status = SystemPowerStatus()
+        if not ctypes.windll.kernel32.GetSystemPowerStatus(ctypes.byref(status)):
+            return False
+        return status.ACLineStatus == 0
+
+    mains = [
+        os.path.join(os.path.dirname(path), "online")
+        for path in glob.glob("/sys/class/power_supply/*/type")
+        if read_power_supply(path) == "Mains"
+    ]
+    if not mains:
+        return False
+    return not any(read_power_supply(path) == "1" for path in mains)
+
+
+def on_battery_power(recheck=60):
+    # ------------------------------------------------------------------------------------
+    # asking the system is not free (pmset is a process on macOS) so the answer is kept
+    # for a minute
+    # ------------------------------------------------------------------------------------
+    now = time.time()
+    if now - power_state["checked"] >= recheck:
+        try:
+            power_state["on battery"] = check_battery_power()
+        except (OSError, subprocess.SubprocessError):
+            power_state["on battery"] = False
+        power_state["checked"] = now
+    return power_state["on battery"]
+
+
+def system_busy(max_load):
+    try:
+        load = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return False
+    return load / (os.cpu_count() or 1) > max_load
+
+
+def preformat_enabled(view, settings):
+    if view.settings().get("is_widget") or view.is_scratch():
+        return False
+    return get_syntax(view) in settings.preformat_syntaxes
+
+
+def preformat_key(view):
+    return ("preformat", view.id())
+
+
+class PreformatApplyCommand(sublime_plugin.TextCommand):
+    def run(self, edit):
+        # --------------------------------------------------------------------------------
+        # run by every pre-save listener that changes the buffer before it does so, the
+        # first one to run applies the result and the rest find nothing left to do
+        # --------------------------------------------------------------------------------
+        settings = current_settings()
+        if not settings.preformat_on_save:
+            return
+        if not preformat_enabled(self.view, settings):
+            return
+
+        command = run_formatter.registry.command(get_syntax(self.view))
+        results = run_formatter.take_precomputed(self.view, command)
+        if results:
+            run_formatter.pending_results[self.view.id()] = (
+                self.view.change_count(),
+                self.view.sel()[0],
+                results,
+                [],
+            )
+            self.view.run_command("universal_format_apply")
+
+
+class PreformatEventListener(sublime_plugin.EventListener):
+    def on_modified_async(self, view):
+        settings = current_settings()
+        if not preformat_enabled(view, settings):
+            return
+
+        # --------------------------------------------------------------------------------
+        # every edit restarts the idle timer
+        # --------------------------------------------------------------------------------
+        run_formatter.scheduler.cancel(preformat_key(view))
+        change_count = view.change_count()
+        idle_timers.schedule(
+            view.id(),
+            lambda: self.on_idle(view, change_count),
+            settings.preformat_delay,
+            on_main_thread=False,
+        )
+
+    def on_idle(self, view, change_count):
+        if not view.is_valid() or view.change_count() != change_count:
+            return
+
+        settings = current_settings()
+        if view.size() > settings.large_buffer_threshold:
+            return
+        if on_battery_power() and not settings.preformat_on_battery:
+            return
+        if system_busy(settings.preformat_max_load):
+            return
+
+        syntax = get_syntax(view)
+        command = run_formatter.registry.command(
+            syntax, run_formatter.save_resolved_path
+        )
+        if not command:
+            return
+        text = view.substr(sublime.Region(0, view.size()))
+
+        def format_job(job):
+            return run_formatter.format_regions(command, [(0, len(text), text)], job)
+
+        def finish(job, outcome):
+            if outcome is None or isinstance(outcome, Exception):
+                return
+            (results, failures) = outcome
+            if not failures:
+                run_formatter.store_precomputed(
+                    view.id(), change_count, command, results
+                )
+
+        # --------------------------------------------------------------------------------
+        # speculative jobs are counted apart from the ones the user asked for so they
+        # never hold up a real format
+        # --------------------------------------------------------------------------------
+        formatter = ("preformat", run_formatter.registry.formatter_name(syntax))
+        run_formatter.scheduler.submit(
+            FormatJob(preformat_key(view), formatter, format_job, finish)
+        )
+
+    def on_pre_save(self, view):
+        view.run_command("preformat_apply")
+
+    def on_close(self, view):
+        idle_timers.cancel(view.id())
+        run_formatter.scheduler.cancel(preformat_key(view))
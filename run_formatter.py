@@ -14,193 +14,566 @@
 # ****************************************************************************************
 
 import os
+import codecs
 import shutil
-from pathlib import Path
-
 import sublime
+import weakref
 import sublime_plugin
+import tempfile
 import subprocess
+import threading
+import concurrent.futures
+from . import format_engine
+from . import batch_format
+from .text_diff import changed_hunks, changed_span
+from .formatter_registry import FormatterRegistry
+from .formatter_jobs import FormatJob, JobScheduler
+from .source_ranges import changed_line_ranges, expand_to_blocks
 from .utilities import *
 
 
+registry = FormatterRegistry()
+scheduler = JobScheduler()
+formatter_timeout = 30
+modified_regions_key = "geedbla_modified"
+
+
 def plugin_loaded():
-    formatters = [
-        "uncrustify",
-        "perltidy",
-        "swiftformat",
-        "gofmt",
-        "black",
-        "rbprettier",
-        "shfmt",
-    ]
+    configure_engine(current_settings())
+    add_on_settings_change("run_formatter", configure_engine)
+
+
+def plugin_unloaded():
+    clear_on_settings_change("run_formatter")
+    format_engine.host.shutdown()
 
-    settings_keys = [
-        "uncrustify exec",
-        "perltidy exec",
-        "swiftformat exec",
-        "go exec",
-        "python exec",
-        "ruby exec",
-        "shfmt exec",
-    ]
 
-    length = len(settings_keys)
-    settingsFile = sublime.packages_path() + "/User/sublime_geedbla.sublime-settings"
+def configure_engine(settings):
+    global formatter_timeout
+
+    formatter_timeout = settings.formatter_timeout
+    scheduler.max_per_formatter = settings.formatter_concurrency
+    cache_dir = None
+    if settings.formatter_disk_cache:
+        cache_dir = sublime.packages_path() + "/User/sublime_geedbla.cache/formatter"
+
+    registry.reload(settings)
+    format_engine.configure(
+        threads=settings.formatter_threads,
+        workers=settings.formatter_workers,
+        worker_idle_timeout=settings.formatter_worker_idle_timeout,
+        cache_entries=settings.formatter_cache_entries,
+        cache_dir=cache_dir,
+        cache_disk_limit=settings.formatter_disk_cache_size * 1024 * 1024,
+    )
+
+
+def save_resolved_path(settings_key, formatter_path):
     settings = sublime.load_settings("sublime_geedbla.sublime-settings")
-    for i in range(length):
-        formatter_path = settings.get(settings_keys[i], "")
-        if formatter_path != "" and formatter_path is not None:
-            if not Path(formatter_path).is_file():
-                formatter_path = shutil.which(os.path.basename(formatter_path))
-                if formatter_path is None:
-                    formatter_path = ""
+    settings.set(settings_key, formatter_path)
+    sublime.save_settings("sublime_geedbla.sublime-settings")
+
+
+class StatusSpinner:
+    frames = ["[=   ]", "[ =  ]", "[  = ]", "[   =]", "[  = ]", "[ =  ]"]
+
+    def __init__(self, view, message, key="geedbla_formatter"):
+        self.view = view
+        self.message = message
+        self.key = key
+        self.index = 0
+        self.running = False
+
+    def start(self):
+        self.running = True
+        self.tick()
+
+    def stop(self):
+        self.running = False
+        self.view.erase_status(self.key)
+
+    def tick(self):
+        if not self.running or not self.view.is_valid():
+            return
+        frame = self.frames[self.index % len(self.frames)]
+        self.view.set_status(self.key, "%s %s" % (self.message, frame))
+        self.index += 1
+        sublime.set_timeout(self.tick, 100)
+
+
+# ----------------------------------------------------------------------------------------
+# formatter results waiting to be applied keyed by view id, they are handed over here
+# rather than as command arguments so big buffers are not copied through JSON
+# ----------------------------------------------------------------------------------------
+pending_results = {}
+
+# ----------------------------------------------------------------------------------------
+# whole buffer results formatted ahead of time while the user was idle, keyed by view id
+# and only good for the change count and command they were made with
+# ----------------------------------------------------------------------------------------
+precomputed_results = {}
+
+
+def store_precomputed(view_id, change_count, command, results):
+    precomputed_results[view_id] = (change_count, command, results)
+
+
+def take_precomputed(view, command):
+    precomputed = precomputed_results.pop(view.id(), None)
+    if precomputed is None:
+        return None
+    (change_count, precomputed_command, results) = precomputed
+    if change_count != view.change_count() or precomputed_command != command:
+        return None
+    return results
+
+
+def format_regions(command, sources, job=None):
+    # ------------------------------------------------------------------------------------
+    # every region is formatted at the same time on the engine's thread pool, failures are
+    # collected so they can be reported together once the results are applied, results
+    # are the (begin, end, replacement) edits for just the lines that changed so the apply
+    # command on the UI thread has no diffing left to do
+    # ------------------------------------------------------------------------------------
+    results = []
+    failures = []
+    outcomes = format_engine.format_many(
+        command,
+        [text.encode("utf-8") for (_, _, text) in sources],
+        formatter_timeout,
+        job,
+    )
+    for (begin, end, text), outcome in zip(sources, outcomes):
+        if isinstance(outcome, Exception):
+            failures.append("The formatter returned an error message %s" % (outcome))
+            continue
+
+        (formatter_return, formatted, errors) = outcome
+        if formatter_return == 0:
+            for start, stop, replacement in changed_hunks(
+                text, formatted.decode("utf-8")
+            ):
+                results.append((begin + start, begin + stop, replacement))
         else:
-            formatter_path = shutil.which(formatters[i])
-            if formatter_path is None:
-                formatter_path = ""
-        settings.set(settings_keys[i], formatter_path)
+            failures.append(
+                "The formatter returned an error code of %x : %s"
+                % (formatter_return, errors.decode("utf-8", "replace"))
+            )
+    return (results, failures)
 
-    sublime.save_settings("sublime_geedbla.sublime-settings")
+
+class FormattedSpan:
+    # ------------------------------------------------------------------------------------
+    # the formatted text of a large buffer left on disk, it is decoded and inserted a
+    # chunk at a time when the result is applied, the folder goes when the span does
+    # ------------------------------------------------------------------------------------
+    def __init__(self, folder, path, start, end):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.remove = weakref.finalize(self, shutil.rmtree, folder, True)
+
+    def chunks(self, chunk_size=1024 * 1024):
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        with open(self.path, "rb") as fileHandle:
+            fileHandle.seek(self.start)
+            remaining = self.end - self.start
+            while remaining > 0:
+                data = fileHandle.read(min(chunk_size, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                text = decoder.decode(data)
+                if text:
+                    yield text
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
+
+    def discard(self):
+        self.remove()
+
+
+def format_large_buffer(view, command, change_count, job=None, chunk_size=1024 * 1024):
+    # ------------------------------------------------------------------------------------
+    # the buffer is spooled to a temporary file a chunk at a time and the formatter reads
+    # and writes files, the changed span of lines stays in the formatter's output file
+    # until it is applied so the buffer is never held in memory more than once
+    # ------------------------------------------------------------------------------------
+    folder = tempfile.mkdtemp(prefix="geedbla-format-")
+    source_path = os.path.join(folder, "source")
+    size = view.size()
+    try:
+        with open(source_path, "wb") as fileHandle:
+            for start in range(0, size, chunk_size):
+                chunk = view.substr(
+                    sublime.Region(start, min(start + chunk_size, size))
+                )
+                fileHandle.write(chunk.encode("utf-8"))
+        if view.change_count() != change_count:
+            shutil.rmtree(folder, True)
+            return ([], [])
+
+        (formatter_return, output_path, errors) = format_engine.run_on_files(
+            command,
+            source_path,
+            os.path.join(folder, "formatted"),
+            formatter_timeout,
+            job,
+        )
+        if formatter_return != 0:
+            shutil.rmtree(folder, True)
+            error_message = "The formatter returned an error code of %x : %s" % (
+                formatter_return,
+                errors.decode("utf-8", "replace"),
+            )
+            return ([], [error_message])
+
+        span = changed_span(source_path, output_path)
+    except Exception as ex:
+        shutil.rmtree(folder, True)
+        return ([], ["The formatter returned an error message %s" % (ex)])
+
+    if span is None:
+        shutil.rmtree(folder, True)
+        return ([], [])
+    (prefix, suffix, start, end) = span
+    return (
+        [(prefix, size - suffix, FormattedSpan(folder, output_path, start, end))],
+        [],
+    )
+
+
+def git_baseline(path):
+    try:
+        folder = os.path.dirname(path)
+        relative = (
+            subprocess.run(
+                ["git", "ls-files", "--full-name", "--", os.path.basename(path)],
+                cwd=folder,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                timeout=10,
+            )
+            .stdout.decode("utf-8")
+            .strip()
+        )
+        if not relative:
+            return None
+        proc = subprocess.run(
+            ["git", "show", "HEAD:" + relative],
+            cwd=folder,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            timeout=10,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if proc.returncode != 0:
+        return None
+    return proc.stdout.decode("utf-8", "replace").replace("\r\n", "\n")
+
+
+def format_modified_lines(command, range_args, text, changed_lines, job=None):
+    # ------------------------------------------------------------------------------------
+    # the changed lines are widened to whole top level blocks, formatters with a native
+    # line range option get the whole buffer and the ranges, everything else is handed
+    # just the blocks as separate pieces
+    # ------------------------------------------------------------------------------------
+    lines = text.splitlines(True)
+    if not lines or not changed_lines:
+        return ([], [])
+    blocks = expand_to_blocks(lines, changed_lines)
+
+    if range_args:
+        command = list(command)
+        for first, last in blocks:
+            for arg in range_args:
+                command.append(
+                    arg.replace("{start}", str(first + 1)).replace(
+                        "{end}", str(last + 1)
+                    )
+                )
+        return format_regions(command, [(0, len(text), text)], job)
+
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    sources = [
+        (offsets[first], offsets[last + 1], text[offsets[first] : offsets[last + 1]])
+        for first, last in blocks
+    ]
+    return format_regions(command, sources, job)
 
 
 class UniversalFormatSource(sublime_plugin.TextCommand):
-    def run(self, edit, **kwargs):
+    def run(self, edit, modified_only=False, since=None, **kwargs):
         command = self.pick_formatter(self.view)
         if not command:
             sublime.status_message("No formatter defined for this language.")
             return
 
         selections = self.view.sel()
-        cursor = self.view.sel()[0]
-
-        if selections[0].empty():
-            region = sublime.Region(0, self.view.size())
-            self.view.sel().clear()
-            self.view.sel().add(region)
-
-        for selection in selections:
-            if not selection.empty():
-                source_code = self.view.substr(selection).encode("utf-8")
-                try:
-                    proc = subprocess.Popen(
-                        command,
-                        stdin=subprocess.PIPE,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                    )
+        cursor = selections[0]
+        change_count = self.view.change_count()
+        view = self.view
+        settings = current_settings()
+        large_buffer = settings.large_buffer_threshold
+
+        if modified_only:
+            since = since or settings.format_modified_since
+            range_args = registry.range_args(get_syntax(view))
+            changed_lines = None
+            if since != "git":
+                changed_lines = [
+                    (view.rowcol(r.begin())[0], view.rowcol(r.end())[0])
+                    for r in view.get_regions(modified_regions_key)
+                ]
+                if not changed_lines:
+                    sublime.status_message("No modified regions to format.")
+                    return
+            elif view.file_name() is None:
+                sublime.status_message("The buffer has not been saved to a file.")
+                return
 
-                    (formatted, errors) = proc.communicate(input=source_code)
-                    formatter_return = proc.poll()
-                    if formatter_return == 0:
-                        self.view.replace(edit, selection, formatted.decode("utf-8"))
-                    else:
-                        error_message = (
-                            "The formatter returned an error code of %x : %s"
-                            % (formatter_return, errors)
-                        )
-                        sublime.error_message(error_message)
-
-                except Exception as ex:
-                    error_message = "The formatter returned an error message %s" % (ex)
+            def format_job(job=None):
+                text = view.substr(sublime.Region(0, view.size()))
+                lines = changed_lines
+                if lines is None:
+                    baseline = git_baseline(view.file_name())
+                    if baseline is None:
+                        baseline = ""
+                    lines = changed_line_ranges(baseline, text)
+                return format_modified_lines(command, range_args, text, lines, job)
+
+        elif cursor.empty() and view.size() > large_buffer:
+
+            def format_job(job=None):
+                return format_large_buffer(view, command, change_count, job)
+
+        else:
+            precomputed = None
+            if cursor.empty():
+                precomputed = take_precomputed(view, command)
+            if precomputed is not None:
+                pending_results[view.id()] = (change_count, cursor, precomputed, [])
+                view.run_command("universal_format_apply")
+                return
+
+            if cursor.empty():
+                regions = [sublime.Region(0, self.view.size())]
+            else:
+                regions = [r for r in selections if not r.empty()]
+            sources = [(r.begin(), r.end(), self.view.substr(r)) for r in regions]
+
+            def format_job(job=None):
+                return format_regions(command, sources, job)
+
+        if not settings.format_async:
+            (results, failures) = format_job()
+            pending_results[view.id()] = (change_count, cursor, results, failures)
+            view.run_command("universal_format_apply")
+            return
+
+        spinner = StatusSpinner(view, "Formatting")
+        spinner.start()
+
+        def finish(job, outcome):
+            def apply_outcome():
+                spinner.stop()
+                if outcome is None:
+                    return
+                if isinstance(outcome, Exception):
+                    error_message = "The formatter returned an error message %s" % (
+                        outcome
+                    )
                     sublime.error_message(error_message)
+                elif view.is_valid():
+                    (results, failures) = outcome
+                    pending_results[view.id()] = (
+                        change_count,
+                        cursor,
+                        results,
+                        failures,
+                    )
+                    view.run_command("universal_format_apply")
 
-                self.view.sel().clear()
-                self.view.sel().add(cursor)
-                sublime.status_message("Formatting complete.")
+            sublime.set_timeout(apply_outcome, 0)
+
+        scheduler.submit(
+            FormatJob(
+                view.id(), registry.formatter_name(get_syntax(view)), format_job, finish
+            )
+        )
 
     def is_enabled(self):
-        ret = False
-        current_lang = get_syntax(self.view)
-        supported_languages = [
-            "C",
-            "C++",
-            "C#",
-            "Objective-C",
-            "Objective-C++",
-            "Java",
-            "Go",
-            "Perl",
-            "Python",
-            "Swift",
-            "Ruby",
-            "Bash",
-        ]
-        if current_lang in supported_languages:
-            ret = True
-        return ret
+        return registry.supports(get_syntax(self.view))
 
     def pick_formatter(self, view):
-        command = []
-        language = get_syntax(view)
-        settings = sublime.load_settings("sublime_geedbla.sublime-settings")
-
-        if (
-            language == "C"
-            or language == "C++"
-            or language == "C#"
-            or language == "Java"
-            or language == "Objective-C"
-            or language == "Objective-C++"
+        return registry.command(get_syntax(view), save_resolved_path)
+
+
+class UniversalFormatApply(sublime_plugin.TextCommand):
+    def run(self, edit):
+        pending = pending_results.pop(self.view.id(), None)
+        if pending is None:
+            return
+
+        (change_count, cursor, results, failures) = pending
+        if failures:
+            if len(failures) > 1:
+                failures.insert(0, "%d regions failed to format." % len(failures))
+            sublime.error_message("\n\n".join(failures))
+
+        if self.view.change_count() != change_count:
+            discard_results(results)
+            sublime.status_message("Buffer changed while formatting, result discarded.")
+            return
+
+        # --------------------------------------------------------------------------------
+        # the results are already just the changed lines, they are replaced back to front
+        # so the earlier ones keep their offsets, an unchanged buffer is not touched at all
+        # --------------------------------------------------------------------------------
+        for begin, end, replacement in sorted(
+            results, key=lambda r: r[0], reverse=True
         ):
-            uncrustify_languages = {
-                "C": "C",
-                "C++": "CPP",
-                "C#": "CS",
-                "Java": "Java",
-                "Objective-C": "OC",
-                "Objective-C++": "OC++",
-            }
-            formatter_exec = settings.get(
-                "uncrustify exec", "/usr/local/bin/uncrustify"
-            )
-            cfg_file = settings.get(
-                "uncrustify config", "-c /Users/garyash/.config/.uncrustify"
-            )
-            cfg_list = cfg_file.split()
-            command = [formatter_exec, "-l", uncrustify_languages[language]]
-            command.extend(cfg_list)
-            return command
-        elif language == "Perl":
-            formatter_exec = settings.get("perltidy exec", "/usr/local/bin/perltidy")
-            cfg_file = settings.get(
-                "perltidy config", "-pro=/Users/garyash/.config/.perltidyrc -st"
-            )
-            cfg_list = cfg_file.split()
-            command = ["perl", formatter_exec]
-            command.extend(cfg_list)
-            return command
-        elif language == "Swift":
-            formatter_exec = settings.get(
-                "swiftformat exec", "/usr/local/bin/swiftformat"
-            )
-            cfg_file = settings.get(
-                "swiftformat config", "--config /Users/garyash/.config/.swiftformat"
-            )
-            cfg_list = cfg_file.split()
-            command = [formatter_exec]
-            command.extend(cfg_list)
-            return command
-        elif language == "Go":
-            cfg_file = settings.get("go config", "")
-            command = [settings.get("go exec", "/usr/local/bin/gofmt"), cfg_file]
-            return command
-        elif language == "Python":
-            command = [settings.get("python exec", "/usr/local/bin/black")]
-            cfg_file = settings.get(
-                "python config", "--config /Users/garyash/.config/black -"
+            if isinstance(replacement, FormattedSpan):
+                self.insertSpan(edit, begin, end, replacement)
+            else:
+                self.view.replace(edit, sublime.Region(begin, end), replacement)
+
+        cursor = sublime.Region(
+            min(cursor.a, self.view.size()), min(cursor.b, self.view.size())
+        )
+        self.view.sel().clear()
+        self.view.sel().add(cursor)
+        if results:
+            sublime.status_message("Formatting complete.")
+        elif not failures:
+            sublime.status_message("Already formatted.")
+
+    def insertSpan(self, edit, begin, end, span):
+        # --------------------------------------------------------------------------------
+        # a large buffer's changed span is read back from the formatter's output a chunk
+        # at a time rather than diffed, only one chunk is ever in memory
+        # --------------------------------------------------------------------------------
+        self.view.erase(edit, sublime.Region(begin, end))
+        point = begin
+        for chunk in span.chunks():
+            point += self.view.insert(edit, point, chunk)
+        span.discard()
+
+    def is_visible(self):
+        return False
+
+
+def discard_results(results):
+    for _, _, replacement in results:
+        if isinstance(replacement, FormattedSpan):
+            replacement.discard()
+
+
+class FormatProjectCommand(sublime_plugin.WindowCommand):
+    def run(self, force=False):
+        folders = self.window.folders()
+        if not folders:
+            sublime.status_message("There are no project folders to format.")
+            return
+
+        settings = current_settings()
+        manifest = (
+            sublime.packages_path() + "/User/sublime_geedbla.cache/format_manifest.json"
+        )
+        panel = self.window.create_output_panel("geedbla_format_project")
+        panel.run_command("append", {"characters": "Formatting %s\n" % folders})
+        self.window.run_command(
+            "show_panel", {"panel": "output.geedbla_format_project"}
+        )
+
+        def progress(done, total):
+            sublime.status_message("Formatted %d of %d files" % (done, total))
+
+        # --------------------------------------------------------------------------------
+        # the plugin host cannot start Python worker processes so a thread pool drives
+        # the formatter processes here, the command line entry point uses processes
+        # --------------------------------------------------------------------------------
+        def format_in_background():
+            summary = batch_format.run_batch(
+                folders,
+                settings,
+                manifest,
+                executor_class=concurrent.futures.ThreadPoolExecutor,
+                jobs=settings.formatter_threads or None,
+                force=force,
+                timeout=formatter_timeout,
+                progress=progress,
             )
-            cfg_list = cfg_file.split()
-            command.extend(cfg_list)
-            return command
-        elif language == "Ruby":
-            command = [settings.get("ruby exec", "rbprettier")]
-            cfg_file = settings.get("ruby config", "")
-            cfg_list = cfg_file.split()
-            command.extend(cfg_list)
-            return command
-        elif language == "Bash":
-            command = [settings.get("shfmt exec", "shfmt")]
-            cfg_file = settings.get("shfmt config", "-ln bash -i 0 -s -ci -")
-            cfg_list = cfg_file.split()
-            command.extend(cfg_list)
-            return command
+            report = batch_format.report(summary)
+            panel.run_command("append", {"characters": report + "\n"})
+            sublime.status_message(report.splitlines()[0])
+
+        threading.Thread(target=format_in_background, daemon=True).start()
+
+
+# ----------------------------------------------------------------------------------------
+# every edit is recorded as a hidden region so Sublime keeps it in place as the text around
+# it changes, the set is cleared when the file is saved (needs build 4081 or later)
+# ----------------------------------------------------------------------------------------
+def moved_point(point, begin, end, inserted):
+    if point <= begin:
+        return point
+    if point >= end:
+        return point + inserted - (end - begin)
+    return begin + inserted
+
+
+class ModifiedRegionTracker(sublime_plugin.TextChangeListener):
+    @classmethod
+    def is_applicable(cls, buffer):
+        return True
+
+    def on_text_changed(self, changes):
+        view = self.buffer.primary_view()
+        if view is None:
+            return
+
+        edited = []
+        for change in changes:
+            (begin, end, inserted) = (change.a.pt, change.b.pt, len(change.str))
+            edited = [
+                (
+                    moved_point(a, begin, end, inserted),
+                    moved_point(b, begin, end, inserted),
+                )
+                for (a, b) in edited
+            ]
+            edited.append((begin, begin + inserted))
+
+        regions = view.get_regions(modified_regions_key)
+        regions.extend(sublime.Region(a, max(a, b)) for (a, b) in edited)
+        merged = []
+        for region in sorted(regions, key=lambda r: r.begin()):
+            if merged and region.begin() <= merged[-1].end():
+                merged[-1] = merged[-1].cover(region)
+            else:
+                merged.append(region)
+        view.add_regions(modified_regions_key, merged, "", "", sublime.HIDDEN)
+
+
+class FormatterEventListener(sublime_plugin.EventListener):
+    def on_post_save(self, view):
+        view.erase_regions(modified_regions_key)
+
+    def on_modified_async(self, view):
+        # --------------------------------------------------------------------------------
+        # a format of text that has since been edited can only be thrown away, so stop it
+        # --------------------------------------------------------------------------------
+        if scheduler.is_busy(view.id()):
+            scheduler.cancel(view.id())
+
+    def on_close(self, view):
+        scheduler.cancel(view.id())
+        precomputed_results.pop(view.id(), None)
+        pending = pending_results.pop(view.id(), None)
+        if pending is not None:
+            discard_results(pending[2])
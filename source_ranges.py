@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ****************************************************************************************
+# source_ranges.py
+#
+# This file contains helpers that work out which lines of a source file were changed and
+# widen them out to whole top level blocks so they can be formatted on their own
+#
+# Author   :  Gary Ash <gary.ash@icloud.com>
+# Created  :  18-Oct-2026  9:12am
+# Modified :
+#
+# Copyright © 2026 By Gary Ash All rights reserved.
+# ****************************************************************************************
+
+import re
+import difflib
+
+# ----------------------------------------------------------------------------------------
+# lines at the left margin that close or continue the block above them rather than start
+# a new one
+# ----------------------------------------------------------------------------------------
+continuation_line = re.compile(
+    r"^(\}|\)|\]|end\b|else\b|elif\b|elsif\b|except\b|finally\b|rescue\b|ensure\b"
+    r"|when\b|done\b|fi\b|esac\b|\.|,)"
+)
+continued_line = re.compile(r"(\\|,|\(|\[|\{|&&|\|\||\+|=)\s*$")
+
+
+def changed_line_ranges(baseline, current):
+    # ------------------------------------------------------------------------------------
+    # (first, last) zero based line numbers in current that differ from baseline, a pure
+    # deletion marks the line that now sits where the deleted lines were
+    # ------------------------------------------------------------------------------------
+    baseline_lines = baseline.splitlines(True)
+    current_lines = current.splitlines(True)
+    last_line = max(len(current_lines) - 1, 0)
+
+    ranges = []
+    matcher = difflib.SequenceMatcher(None, baseline_lines, current_lines)
+    for tag, _, _, j1, j2 in matcher.get_opcodes():
+        if tag != "equal":
+            ranges.append((min(j1, last_line), min(max(j1, j2 - 1), last_line)))
+    return merge_ranges(ranges)
+
+
+def merge_ranges(ranges):
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def starts_block(lines, index):
+    line = lines[index]
+    if not line.strip() or line[0] in " \t":
+        return False
+    if continuation_line.match(line):
+        return False
+    return index == 0 or not continued_line.search(lines[index - 1].rstrip("\r\n"))
+
+
+def expand_to_blocks(lines, ranges):
+    # ------------------------------------------------------------------------------------
+    # each range grows up to the line that starts its top level block (a non blank line at
+    # the left margin that does not close or continue something) and down to the line
+    # before the next such line, less any trailing blank lines
+    # ------------------------------------------------------------------------------------
+    blocks = []
+    for first, last in ranges:
+        first = min(first, len(lines) - 1)
+        last = min(last, len(lines) - 1)
+        while first > 0 and not starts_block(lines, first):
+            first -= 1
+
+        last += 1
+        while last < len(lines) and not starts_block(lines, last):
+            last += 1
+        last -= 1
+        while last > first and not lines[last].strip():
+            last -= 1
+        blocks.append((first, last))
+    return merge_ranges(blocks)
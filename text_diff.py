@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ****************************************************************************************
+# text_diff.py
+#
+# This file contains a line based diff used to turn a formatter's output into the small
+# set of replacements needed to get from the original text to the formatted text
+#
+# Author   :  Gary Ash <gary.ash@icloud.com>
+# Created  :  18-Oct-2026  9:12am
+# Modified :
+#
+# Copyright © 2026 By Gary Ash All rights reserved.
+# ****************************************************************************************
+
+import os
+import codecs
+
+
+def resync(original_lines, formatted_lines, i, j, window):
+    # ------------------------------------------------------------------------------------
+    # the nearest pair of equal lines at or after (i, j) within window lines of both, or
+    # None, each call is linear in the window
+    # ------------------------------------------------------------------------------------
+    first_seen = {}
+    for y in range(j, min(j + window, len(formatted_lines))):
+        first_seen.setdefault(formatted_lines[y], y)
+
+    best = None
+    for x in range(i, min(i + window, len(original_lines))):
+        if best is not None and x - i >= best[0]:
+            break
+        y = first_seen.get(original_lines[x])
+        if y is not None and (best is None or (x - i) + (y - j) < best[0]):
+            best = ((x - i) + (y - j), x, y)
+    return None if best is None else (best[1], best[2])
+
+
+def changed_hunks(original, formatted, window=200, max_hunks=5000):
+    # ------------------------------------------------------------------------------------
+    # returns (start, end, replacement) tuples with offsets into original, in ascending
+    # order and not overlapping, an empty list means there is nothing to change
+    # ------------------------------------------------------------------------------------
+    if original == formatted:
+        return []
+
+    original_lines = original.splitlines(True)
+    formatted_lines = formatted.splitlines(True)
+
+    # ------------------------------------------------------------------------------------
+    # the common head and tail are skipped first, formatters usually leave most of a
+    # file alone
+    # ------------------------------------------------------------------------------------
+    limit = min(len(original_lines), len(formatted_lines))
+    prefix = 0
+    while prefix < limit and original_lines[prefix] == formatted_lines[prefix]:
+        prefix += 1
+
+    suffix = 0
+    while (
+        suffix < limit - prefix
+        and original_lines[-1 - suffix] == formatted_lines[-1 - suffix]
+    ):
+        suffix += 1
+
+    original_middle = original_lines[prefix : len(original_lines) - suffix]
+    formatted_middle = formatted_lines[prefix : len(formatted_lines) - suffix]
+
+    offsets = [sum(len(line) for line in original_lines[:prefix])]
+    for line in original_middle:
+        offsets.append(offsets[-1] + len(line))
+
+    # ------------------------------------------------------------------------------------
+    # the two sides are walked together and put back in step at the nearest equal lines
+    # after each difference, formatter changes are local so this stays linear, when
+    # nothing lines up nearby (or there are too many hunks) the rest is one replacement
+    # ------------------------------------------------------------------------------------
+    hunks = []
+    (i, j) = (0, 0)
+    (n, m) = (len(original_middle), len(formatted_middle))
+    while i < n and j < m:
+        if original_middle[i] == formatted_middle[j]:
+            i += 1
+            j += 1
+            continue
+        found = None
+        if len(hunks) < max_hunks:
+            found = resync(original_middle, formatted_middle, i, j, window)
+        if found is None:
+            break
+        (x, y) = found
+        hunks.append((offsets[i], offsets[x], "".join(formatted_middle[j:y])))
+        (i, j) = (x, y)
+
+    if i < n or j < m:
+        hunks.append((offsets[i], offsets[n], "".join(formatted_middle[j:])))
+    return hunks
+
+
+def count_characters(fileHandle, start, end, chunk_size=1024 * 1024):
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    fileHandle.seek(start)
+    count = 0
+    while start < end:
+        chunk = fileHandle.read(min(chunk_size, end - start))
+        if not chunk:
+            break
+        start += len(chunk)
+        count += len(decoder.decode(chunk))
+    return count + len(decoder.decode(b"", final=True))
+
+
+def common_prefix(original, formatted, chunk_size=1024 * 1024):
+    original.seek(0)
+    formatted.seek(0)
+    length = 0
+    while True:
+        a = original.read(chunk_size)
+        b = formatted.read(chunk_size)
+        if a != b or not a:
+            limit = min(len(a), len(b))
+            index = 0
+            while index < limit and a[index] == b[index]:
+                index += 1
+            return length + index
+        length += len(a)
+
+
+def common_suffix(original, formatted, original_size, formatted_size, limit):
+    length = 0
+    chunk_size = 64 * 1024
+    while length < limit:
+        size = min(chunk_size, limit - length)
+        original.seek(original_size - length - size)
+        formatted.seek(formatted_size - length - size)
+        a = original.read(size)
+        b = formatted.read(size)
+        if a != b:
+            index = 0
+            while a[size - 1 - index] == b[size - 1 - index]:
+                index += 1
+            return length + index
+        length += size
+    return length
+
+
+def line_start_before(fileHandle, position, chunk_size=64 * 1024):
+    while position > 0:
+        start = max(0, position - chunk_size)
+        fileHandle.seek(start)
+        newline = fileHandle.read(position - start).rfind(b"\n")
+        if newline >= 0:
+            return start + newline + 1
+        position = start
+    return 0
+
+
+def line_start_after(fileHandle, position, end, chunk_size=64 * 1024):
+    start = position
+    while position < end:
+        fileHandle.seek(position)
+        newline = fileHandle.read(min(chunk_size, end - position)).find(b"\n")
+        if newline >= 0:
+            return position + newline + 1
+        position += chunk_size
+    return max(start, end)
+
+
+def changed_span(original_path, formatted_path):
+    # ------------------------------------------------------------------------------------
+    # compares two UTF-8 files without loading either of them, returns None when they are
+    # the same, otherwise (prefix, suffix, start, end) where prefix and suffix are the
+    # number of characters of unchanged whole lines at each end and start and end are the
+    # byte offsets in the formatted file of the text that replaces everything in between,
+    # it is left on disk so it can be read back a piece at a time
+    # ------------------------------------------------------------------------------------
+    original_size = os.path.getsize(original_path)
+    formatted_size = os.path.getsize(formatted_path)
+
+    with open(original_path, "rb") as original, open(formatted_path, "rb") as formatted:
+        prefix = common_prefix(original, formatted)
+        if prefix == original_size == formatted_size:
+            return None
+        prefix = line_start_before(original, prefix)
+
+        limit = min(original_size, formatted_size) - prefix
+        suffix = common_suffix(
+            original, formatted, original_size, formatted_size, limit
+        )
+        if suffix > 0:
+            suffix_start = line_start_after(
+                original, original_size - suffix, original_size
+            )
+            suffix = original_size - suffix_start
+
+        prefix_characters = count_characters(original, 0, prefix)
+        suffix_characters = count_characters(
+            original, original_size - suffix, original_size
+        )
+    return (prefix_characters, suffix_characters, prefix, formatted_size - suffix)
@@ -14,13 +14,39 @@
 import os
 import sublime
 from pathlib import Path
+from sublime_geedbla import package_settings
 
 
 def plugin_loaded():
+    comment_styles.clear()
+    current_settings()
+
+
+def plugin_unloaded():
+    settings = sublime.load_settings("sublime_geedbla.sublime-settings")
+    settings.clear_on_change("sublime_geedbla.sublime-settings")
+
+
+# ----------------------------------------------------------------------------------------
+# the package settings are read into one snapshot at start up and again each time the file
+# changes, everything else reads its options from the snapshot and may compare versions to
+# tell when something it worked out from them is out of date
+# ----------------------------------------------------------------------------------------
+settings_snapshot = None
+settings_listeners = {}
+
+
+def current_settings():
+    if settings_snapshot is None:
+        load_package_settings()
+    return settings_snapshot
+
+
+def load_package_settings():
     settingsFile = sublime.packages_path() + "/User/sublime_geedbla.sublime-settings"
     chk_file = Path(settingsFile)
+    settings = sublime.load_settings("sublime_geedbla.sublime-settings")
     if not chk_file.is_file():
-        settings = sublime.load_settings("sublime_geedbla.sublime-settings")
         settings.set("line_length", 90)
         settings.set("author", "")
         settings.set("email", "")
@@ -28,37 +54,27 @@ def plugin_loaded():
         settings.set("folders_to_open", [])
         sublime.save_settings("sublime_geedbla.sublime-settings")
 
-    load_aettings()
-    settings = sublime.load_settings("sublime_geedbla.sublime-settings")
-    settings.add_on_change("sublime_geedbla.sublime-settings", lambda: load_aettings())
+    reload_settings()
+    settings.add_on_change("sublime_geedbla.sublime-settings", reload_settings)
 
 
-def load_aettings():
-    global author
-    global email_address
-    global organizations
-    global line_length
-    global organization
-    global organizations
-    global folders_to_open
+def reload_settings():
+    global settings_snapshot
 
-    settings = sublime.load_settings("sublime_geedbla.sublime-settings")
+    version = settings_snapshot.version + 1 if settings_snapshot is not None else 1
+    settings_snapshot = package_settings.SettingsSnapshot(
+        sublime.load_settings("sublime_geedbla.sublime-settings"), version
+    )
+    for listener in list(settings_listeners.values()):
+        listener(settings_snapshot)
 
-    line_length = settings.get("line_length", 90)
-    author = settings.get("author", "Gary Ash")
-    email_address = settings.get("email", "gary.ash@icloud.com")
-    organizations = settings.get("organizations", ["Gee Dbl A"])
-    folders_to_open = settings.get("folders_to_open", ["/opt/geedbla"])
 
-    try:
-        organization = organizations[0]
-    except:
-        organization = "Gee Dbl A"
+def add_on_settings_change(key, listener):
+    settings_listeners[key] = listener
 
 
-def plugin_unloaded():
-    settings = sublime.load_settings("sublime_geedbla.sublime-settings")
-    settings.clear_on_change("sublime_geedbla.sublime-settings")
+def clear_on_settings_change(key):
+    settings_listeners.pop(key, None)
 
 
 def get_syntax(view):
@@ -68,43 +84,88 @@ def get_syntax(view):
     return syn
 
 
-def get_comment(view):
-    comment_start = ""
-    comment_end = ""
-    comment_number = ""
-    comments_only = {}
+comment_exception = {
+    "Ruby": ("#", ""),
+    "Python": ("# ", ""),
+    "AppleScript": ("(*", "*)"),
+    "AppleScript (Binary)": ("(*", "*)"),
+}
 
-    comment_exception = {
-        "Ruby": ("#", ""),
-        "Python": ("# ", ""),
-        "AppleScript": ("(*", "*)"),
-        "AppleScript (Binary)": ("(*", "*)"),
-    }
+# ----------------------------------------------------------------------------------------
+# comment delimiters keyed by syntax file, they only change when a package is reloaded or
+# a syntax or preferences file is saved
+# ----------------------------------------------------------------------------------------
+comment_styles = {}
 
+
+def read_comment_styles(view):
+    # ------------------------------------------------------------------------------------
+    # "comment" is the pair the header uses, "line" and "block" are the first line and
+    # block forms of all the TM_COMMENT_START/END variants, or None if there are none
+    # ------------------------------------------------------------------------------------
     language = get_syntax(view)
     if language in comment_exception:
-        return comment_exception[language]
+        pair = comment_exception[language]
+        return {
+            "comment": pair,
+            "line": None if pair[1] else pair,
+            "block": pair if pair[1] else None,
+        }
 
-    shell_variables = view.meta_info("shellVariables", 0)
+    comment_start = ""
+    comment_end = ""
+    comment_number = ""
+    comments_only = {}
+
+    shell_variables = view.meta_info("shellVariables", 0) or []
     for variable_dic in shell_variables:
         name = variable_dic["name"]
         if "TM_COMMENT_" in name:
             comments_only[name] = variable_dic["value"]
 
+    variants = []
+    found_end = False
     for i in range(1, 4):
         if i > 1:
             comment_number = "_" + str(i)
 
         start_name = "TM_COMMENT_START" + comment_number
         end_name = "TM_COMMENT_END" + comment_number
-
         if start_name in comments_only:
-            comment_start = comments_only[start_name].strip()
-        if end_name in comments_only:
-            comment_end = comments_only[end_name].strip()
-            break
+            variants.append(
+                (
+                    comments_only[start_name].strip(),
+                    comments_only.get(end_name, "").strip(),
+                )
+            )
+
+        if not found_end:
+            if start_name in comments_only:
+                comment_start = comments_only[start_name].strip()
+            if end_name in comments_only:
+                comment_end = comments_only[end_name].strip()
+                found_end = True
+
+    line = [variant for variant in variants if not variant[1]]
+    block = [variant for variant in variants if variant[1]]
+    return {
+        "comment": (comment_start, comment_end),
+        "line": line[0] if line else None,
+        "block": block[0] if block else None,
+    }
 
-    return (comment_start, comment_end)
+
+def get_comment_styles(view):
+    syntax_file = view.settings().get("syntax")
+    styles = comment_styles.get(syntax_file)
+    if styles is None:
+        styles = read_comment_styles(view)
+        comment_styles[syntax_file] = styles
+    return styles
+
+
+def get_comment(view):
+    return get_comment_styles(view)["comment"]
 
 
 def get_cursor_position(view):